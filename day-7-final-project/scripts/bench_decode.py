@@ -0,0 +1,65 @@
+"""Microbenchmark: decoding API responses into WeatherData
+
+Compares json.loads + WeatherData.from_api (a dict for every object in
+the payload) with the schema-driven decode_weather, on a full-size
+current weather response.
+
+Usage: python scripts/bench_decode.py [--count N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api import WeatherData
+from src.decode import decode_weather, msgspec
+
+PAYLOAD = json.dumps({
+    "coord": {"lon": -0.1257, "lat": 51.5085},
+    "weather": [{"id": 803, "main": "Clouds", "description": "broken clouds", "icon": "04d"}],
+    "base": "stations",
+    "main": {
+        "temp": 14.62, "feels_like": 14.1, "temp_min": 13.3, "temp_max": 15.7,
+        "pressure": 1012, "humidity": 77, "sea_level": 1012, "grnd_level": 1008
+    },
+    "visibility": 10000,
+    "wind": {"speed": 4.12, "deg": 240, "gust": 7.6},
+    "clouds": {"all": 75},
+    "dt": 1760698800,
+    "sys": {"type": 2, "id": 2075535, "country": "GB", "sunrise": 1760682232, "sunset": 1760720061},
+    "timezone": 3600,
+    "id": 2643743,
+    "name": "London",
+    "cod": 200
+}).encode()
+
+FETCHED_AT = 1760702400.0
+
+def dict_path():
+    return WeatherData.from_api(json.loads(PAYLOAD), fetched_at=FETCHED_AT)
+
+def typed_path():
+    return decode_weather(PAYLOAD, WeatherData, fetched_at=FETCHED_AT)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response decoding")
+    parser.add_argument("--count", type=int, default=100_000, help="Decodes per timing run")
+    args = parser.parse_args()
+    
+    assert dict_path() == typed_path()
+    print(f"Payload: {len(PAYLOAD)} bytes, msgspec {'installed' if msgspec else 'NOT installed (json fallback)'}")
+    
+    results = {}
+    for name, func in (("json.loads + from_api", dict_path), ("decode_weather", typed_path)):
+        best = min(timeit.repeat(func, number=args.count, repeat=5))
+        results[name] = best
+        print(f"  {name:<24} {best / args.count * 1e6:6.2f} µs/record  {args.count / best:>10,.0f} records/s")
+    
+    print(f"Speedup: {results['json.loads + from_api'] / results['decode_weather']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Microbenchmark: memory and construction cost per weather record
+
+Compares the former WeatherData (a dataclass with a __dict__ and an ISO
+string timestamp made per record) with the slotted, epoch-timestamped
+WeatherData and with appending to a columnar WeatherBatch.
+
+Usage: python scripts/bench_records.py [--count N]
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api import WeatherData
+from src.batch import WeatherBatch
+
+@dataclass
+class DictWeatherData:
+    """WeatherData as it was before it was slotted"""
+    city: str
+    country: str
+    temp_celsius: float
+    humidity: int
+    description: str
+    wind_speed: float
+    fetched_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+COUNTRIES = ["GB", "FR", "DE", "US", "JP"]
+DESCRIPTIONS = ["clear sky", "few clouds", "broken clouds", "light rain", "mist"]
+
+def fields(count: int):
+    """Decoded-response values; the strings exist before any record does"""
+    cities = [f"City{i}" for i in range(count)]
+    return [
+        (cities[i], COUNTRIES[i % 5], 10.0 + i % 20 / 4, 40 + i % 50, DESCRIPTIONS[i % 5], 1.5 + i % 8)
+        for i in range(count)
+    ]
+
+def build_records(record_type, rows):
+    return [record_type(*row) for row in rows]
+
+def build_batch(rows):
+    batch = WeatherBatch()
+    for row in rows:
+        batch.append(WeatherData(*row))
+    return batch
+
+def measure(build, rows):
+    """(bytes allocated and still held, seconds) for building from rows"""
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    gc.collect()
+    start = time.perf_counter()
+    result = build(rows)
+    seconds = time.perf_counter() - start
+    del result
+    return held, seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark weather record memory and construction")
+    parser.add_argument("--count", type=int, default=200_000, help="Records to build")
+    args = parser.parse_args()
+    
+    rows = fields(args.count)
+    cases = (
+        ("dataclass + ISO string", lambda rows: build_records(DictWeatherData, rows)),
+        ("slotted WeatherData", lambda rows: build_records(WeatherData, rows)),
+        ("WeatherBatch", build_batch),
+    )
+    
+    print(f"{args.count:,} records (excluding the input strings)")
+    baseline = None
+    for name, build in cases:
+        held, seconds = measure(build, rows)
+        line = f"  {name:<24} {held / args.count:6.1f} bytes/record  {seconds / args.count * 1e6:5.2f} µs/record"
+        if baseline:
+            line += f"  ({baseline[0] / held:.1f}x less memory, {baseline[1] / seconds:.1f}x faster)"
+        baseline = baseline or (held, seconds)
+        print(line)
+    
+    batch = build_batch(rows)
+    start = time.perf_counter()
+    frame = batch.to_pandas()
+    print(f"WeatherBatch.to_pandas(): {(time.perf_counter() - start) * 1e3:.1f} ms for {len(frame):,} rows")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,67 @@
 """API client for weather data"""
 
+import asyncio
+import json
 import requests
+import threading
 import time
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Optional, Dict, Any, List, Tuple
+from datetime import datetime, timezone
 from dataclasses import dataclass, field
+from requests.adapters import HTTPAdapter
 from tenacity import (
     retry,
     stop_after_attempt,
+    stop_any,
     wait_exponential,
     retry_if_exception_type,
     before_sleep_log
 )
 
 from .config import PipelineConfig
+from .cache import ResponseCache
+from .cities import CityIndex
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from .deadline import Deadline, DeadlineExceeded
+from .decode import PayloadError, decode_group, decode_weather
+from .hedging import HedgePolicy
+from .quota import QuotaExhausted, QuotaLedger, key_id
+from .singleflight import SingleFlight
+from .sources import city_key
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# WeatherData stores Celsius, so requests are always metric
+UNITS = "metric"
+
+# Maximum city IDs the group endpoint accepts per call
+GROUP_LIMIT = 20
+
+@dataclass(slots=True)
 class WeatherData:
-    """Weather data for a city"""
+    """Weather data for a city
+    
+    Slotted, with the fetch time as epoch seconds; to_dict() formats it as
+    a local ISO timestamp. For many records, see WeatherBatch.
+    """
     city: str
     country: str
     temp_celsius: float
     humidity: int
     description: str
     wind_speed: float
-    fetched_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    fetched_at: float = field(default_factory=time.time)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -37,94 +71,1036 @@ class WeatherData:
             "humidity": self.humidity,
             "description": self.description,
             "wind_speed": self.wind_speed,
-            "fetched_at": self.fetched_at
+            "fetched_at": datetime.fromtimestamp(self.fetched_at).isoformat()
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WeatherData":
+        """Inverse of to_dict()"""
+        return cls(**{**data, "fetched_at": datetime.fromisoformat(data["fetched_at"]).timestamp()})
+    
+    @classmethod
+    def from_api(cls, data: Dict[str, Any], **kwargs) -> "WeatherData":
+        """Build from an OpenWeatherMap current weather payload"""
+        return cls(
+            city=data["name"],
+            country=data["sys"]["country"],
+            temp_celsius=data["main"]["temp"],
+            humidity=data["main"]["humidity"],
+            description=data["weather"][0]["description"],
+            wind_speed=data["wind"]["speed"],
+            **kwargs
+        )
 
 class RateLimiter:
-    """Simple rate limiter"""
+    """Token bucket rate limiter, safe to share between threads and asyncio tasks
+    
+    Allows bursts of up to `burst` calls, then refills at `calls_per_second`.
+    Tokens are reserved under a lock and the caller sleeps outside it, so one
+    instance can serve both time.sleep and asyncio.sleep callers.
+    """
+    
+    def __init__(self, calls_per_second: float, burst: int = 1):
+        self.rate = calls_per_second
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def _bucket(self):
+        """Hold the bucket state for update"""
+        with self._lock:
+            yield
+    
+    def _refill(self, now: float):
+        elapsed = max(now - self.updated, 0.0)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+    
+    def reserve(self) -> float:
+        """Take a token and return how long to wait until it is valid"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            
+            # A negative balance is a debt later callers queue behind
+            sleep_time = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.throttled_seconds += sleep_time
+            return sleep_time
+    
+    def refund(self):
+        """Give back a token reserved but not used"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens + 1)
+    
+    def try_reserve(self) -> bool:
+        """Take a token only if one is free now"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
     
-    def __init__(self, calls_per_second: float):
-        self.min_interval = 1.0 / calls_per_second
-        self.last_call = 0.0
+    def available(self) -> float:
+        """Tokens in the bucket now (negative while callers are queued)"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            return self.tokens
+    
+    def set_rate(self, calls_per_second: float):
+        """Change the refill rate, keeping tokens accrued at the old rate"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            self.rate = calls_per_second
+    
+    def pause(self, seconds: float):
+        """Hold off every caller for at least `seconds` (e.g. for Retry-After)"""
+        with self._bucket():
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
     
     def wait(self):
         """Wait if necessary to respect rate limit"""
-        now = time.time()
-        elapsed = now - self.last_call
-        
-        if elapsed < self.min_interval:
-            sleep_time = self.min_interval - elapsed
+        sleep_time = self.reserve()
+        if sleep_time > 0:
             logger.debug(f"Rate limiting: waiting {sleep_time:.2f}s")
             time.sleep(sleep_time)
+    
+    async def wait_async(self):
+        """Async version of wait() that yields to other tasks while throttled"""
+        sleep_time = self.reserve()
+        if sleep_time > 0:
+            logger.debug(f"Rate limiting: waiting {sleep_time:.2f}s")
+            await asyncio.sleep(sleep_time)
+
+class SharedRateLimiter(RateLimiter):
+    """Token bucket kept in a file so every process on the host shares it
+    
+    The bucket state is read and written under an exclusive flock, so
+    parallel `cli fetch` runs draw from one quota. time.monotonic is
+    system-wide on Linux and macOS, so timestamps compare across processes.
+    """
+    
+    def __init__(self, calls_per_second: float, burst: int = 1, path: Path = None):
+        if fcntl is None:
+            raise RuntimeError("SharedRateLimiter requires fcntl (POSIX only)")
+        super().__init__(calls_per_second, burst)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+    
+    @contextmanager
+    def _bucket(self):
+        """Load the shared bucket under a file lock and save it afterwards"""
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = json.loads(f.read() or "{}")
+                self.tokens = state.get("tokens", float(self.burst))
+                self.updated = state.get("updated", time.monotonic())
+                
+                yield
+                
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": self.tokens, "updated": self.updated}))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class AdaptiveRateController:
+    """AIMD control of a RateLimiter driven by response health
+    
+    Each healthy response adds `increase / rate` calls/s, i.e. roughly
+    `increase` calls/s per second of healthy traffic, up to `max_rate`.
+    A 429 or 5xx multiplies the rate by `decrease` (at most once per
+    cooldown, so a burst of in-flight failures counts once) and pauses the
+    limiter for any Retry-After. With adaptive=False only Retry-After is
+    honoured and the configured rate is left alone.
+    """
+    
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        min_rate: float,
+        max_rate: float,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        adaptive: bool = True
+    ):
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, limiter.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.adaptive = adaptive
+        self.cooldown = 1.0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+    
+    def on_success(self):
+        if not self.adaptive:
+            return
+        with self._lock:
+            rate = self.limiter.rate
+            if rate < self.max_rate:
+                self.limiter.set_rate(min(self.max_rate, rate + self.increase / rate))
+    
+    def on_throttle(self, retry_after: Optional[float] = None):
+        if retry_after:
+            logger.warning(f"Provider asked us to back off for {retry_after:.1f}s")
+            self.limiter.pause(retry_after)
         
-        self.last_call = time.time()
+        if not self.adaptive:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_decrease < max(self.cooldown, retry_after or 0):
+                return
+            self.last_decrease = now
+            rate = max(self.min_rate, self.limiter.rate * self.decrease)
+            self.limiter.set_rate(rate)
+            logger.warning(f"Rate limit reduced to {rate:.2f} calls/s")
+
+class RetryLater(Exception):
+    """A retryable failure; the city should be scheduled again
+    
+    `throttled` is True when the provider pushed back (429/5xx) rather than
+    the request failing in transit (timeout, connection error).
+    """
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+class KeyRejected(RetryLater):
+    """The API key was refused (401) but another key in the pool can retry"""
 
-class WeatherAPIClient:
-    """Client for OpenWeatherMap API"""
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def create_rate_limiter(config: PipelineConfig, key_id: str = None) -> RateLimiter:
+    """Build the configured rate limiter (shared across processes if a file is set)
+    
+    With a key_id, the shared state file is made specific to that API key.
+    """
+    if config.rate_limit_file:
+        path = Path(config.rate_limit_file)
+        if key_id:
+            path = path.with_name(f"{path.stem}-{key_id}{path.suffix}")
+        logger.info(f"Using shared rate limiter: {path}")
+        return SharedRateLimiter(config.calls_per_second, config.rate_limit_burst, path)
+    return RateLimiter(config.calls_per_second, config.rate_limit_burst)
+
+def quota_rate(config: PipelineConfig) -> Optional[float]:
+    """Highest calls/s per key that stays within the per-minute quota"""
+    return config.quota_per_minute / 60 if config.quota_per_minute else None
+
+class ApiKey:
+    """One API key with its own rate limit and usage count"""
+    
+    def __init__(self, value: str, config: PipelineConfig, pooled: bool):
+        self.value = value
+        self.id = key_id(value)
+        self.label = f"…{value[-4:]}"
+        self.limiter = create_rate_limiter(config, self.id if pooled else None)
+        max_rate = config.max_calls_per_second
+        cap = quota_rate(config)
+        if cap:
+            # Stretch the schedule rather than run into the per-minute cap
+            self.limiter.set_rate(min(self.limiter.rate, cap))
+            max_rate = min(max_rate, cap)
+        self.rate_control = AdaptiveRateController(
+            self.limiter,
+            min_rate=min(config.min_calls_per_second, self.limiter.rate),
+            max_rate=max_rate,
+            adaptive=config.adaptive_rate
+        )
+        self.calls = 0
+        self.pending = 0  # Reserved against the quota but not yet sent
+        self.suspended_until = 0.0
+
+class KeyPool:
+    """Spreads requests over one or more API keys
+    
+    Each call goes to the key whose bucket has the most tokens, i.e. the
+    one that can send soonest, so throughput scales with the number of
+    keys. A pooled key answered with 429 is paused for Retry-After (or
+    `key_cooldown`); one answered with 401 is suspended for
+    `key_suspend_seconds` while other keys are usable.
+    
+    With quota tracking on, every call sent is counted in the QuotaLedger
+    (see record_call), and calls reserved but not yet sent count against
+    the quota too, so concurrent callers can't overshoot it. A key taken
+    with acquire() must be passed to record_call() or release(). Keys at
+    their per-minute cap wait for the next minute, and once every key has
+    used its daily or monthly quota QuotaExhausted is raised.
+    """
     
     def __init__(self, config: PipelineConfig):
         self.config = config
-        self.rate_limiter = RateLimiter(config.calls_per_second)
-        self._setup_retry()
+        values = config.all_api_keys()
+        self.keys = [ApiKey(value, config, pooled=len(values) > 1) for value in values]
+        self.ledger = QuotaLedger(config.quota_path, config.quota_limits()) if config.track_quota else None
+        self.suspensions = 0
+        self._lock = threading.Lock()
+        if len(self.keys) > 1:
+            logger.info(f"Using {len(self.keys)} API keys")
+        cap = quota_rate(config)
+        rate = config.max_calls_per_second if config.adaptive_rate else config.calls_per_second
+        if cap and cap < rate:
+            logger.warning(
+                f"Rate capped at {cap:.2f} calls/s per key (below the configured {rate:g}) "
+                f"by QUOTA_PER_MINUTE={config.quota_per_minute}"
+            )
     
-    def _setup_retry(self):
-        """Configure retry decorator"""
-        self._fetch_with_retry = retry(
-            stop=stop_after_attempt(self.config.max_retries),
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @property
+    def throttled_seconds(self) -> float:
+        return sum(key.limiter.throttled_seconds for key in self.keys)
+    
+    def calls_left(self) -> Optional[int]:
+        """Calls the pool may still make today and this month (None if uncapped)"""
+        if self.ledger is None:
+            return None
+        return self.ledger.calls_left(key.id for key in self.keys)
+    
+    def _within_quota(self, keys: List[ApiKey]) -> Tuple[List[ApiKey], float]:
+        """Keys with quota left now, or those free again next minute and the wait"""
+        open_keys, next_minute = [], []
+        for key in keys:
+            period = self.ledger.exhausted(key.id, key.pending)
+            if period is None:
+                open_keys.append(key)
+            elif period == "minute":
+                next_minute.append(key)
+        
+        if open_keys:
+            return open_keys, 0.0
+        if next_minute:
+            return next_minute, self.ledger.seconds_to_next_minute()
+        raise QuotaExhausted("daily or monthly quota used up on every API key")
+    
+    def _reserve(self) -> Tuple[ApiKey, float]:
+        """Pick the least loaded key and reserve a call on it"""
+        with self._lock:
+            now = time.monotonic()
+            usable = [key for key in self.keys if key.suspended_until <= now] or self.keys
+            quota_wait = 0.0
+            if self.ledger:
+                usable, quota_wait = self._within_quota(usable)
+            key = max(usable, key=lambda key: key.limiter.available())
+            key.pending += 1
+            return key, max(key.limiter.reserve(), quota_wait)
+    
+    def try_acquire(self) -> Optional[ApiKey]:
+        """A key with a token free right now, or None rather than wait"""
+        with self._lock:
+            now = time.monotonic()
+            usable = [key for key in self.keys if key.suspended_until <= now] or self.keys
+            if self.ledger:
+                try:
+                    usable, quota_wait = self._within_quota(usable)
+                except QuotaExhausted:
+                    return None
+                if quota_wait:
+                    return None
+            key = max(usable, key=lambda key: key.limiter.available())
+            if not key.limiter.try_reserve():
+                return None
+            key.pending += 1
+            return key
+    
+    def record_call(self, key: ApiKey):
+        """Count a call as it is sent
+        
+        Done at send time rather than in acquire(), so a call abandoned
+        while waiting (deadline, cancellation) isn't charged, and one that
+        waited into the next minute lands in that minute's bucket.
+        """
+        if self.ledger:
+            self.ledger.record(key.id)
+        with self._lock:
+            key.calls += 1
+            key.pending -= 1
+    
+    def release(self, key: ApiKey):
+        """Drop a key's reservation for a call that won't be sent"""
+        with self._lock:
+            key.pending -= 1
+    
+    def _check_deadline(self, key: ApiKey, sleep_time: float, deadline: Optional[Deadline]):
+        """Hand the token back if waiting for it would pass the deadline"""
+        if deadline is None:
+            return
+        try:
+            deadline.check(sleep_time)
+        except DeadlineExceeded:
+            key.limiter.refund()
+            raise
+    
+    def acquire(self, deadline: Deadline = None) -> ApiKey:
+        """Return a key to use, waiting for its rate limit
+        
+        Raises DeadlineExceeded rather than wait past the deadline.
+        """
+        key, sleep_time = self._reserve()
+        try:
+            self._check_deadline(key, sleep_time, deadline)
+            if sleep_time > 0:
+                logger.debug(f"Rate limiting: waiting {sleep_time:.2f}s")
+                time.sleep(sleep_time)
+        except BaseException:
+            self.release(key)
+            raise
+        return key
+    
+    async def acquire_async(self, deadline: Deadline = None) -> ApiKey:
+        """Async version of acquire()"""
+        key, sleep_time = self._reserve()
+        try:
+            self._check_deadline(key, sleep_time, deadline)
+            if sleep_time > 0:
+                logger.debug(f"Rate limiting: waiting {sleep_time:.2f}s")
+                await asyncio.sleep(sleep_time)
+        except BaseException:
+            self.release(key)
+            raise
+        return key
+    
+    def cool_down(self, key: ApiKey, retry_after: Optional[float] = None):
+        """Rest a pooled key that hit its quota so the others take its traffic"""
+        if len(self.keys) > 1 and not retry_after:
+            key.limiter.pause(self.config.key_cooldown)
+    
+    def suspend(self, key: ApiKey) -> bool:
+        """Set a rejected key aside; return True if another key can take over"""
+        with self._lock:
+            now = time.monotonic()
+            # Requests already in flight on the key are rejected too; count it once
+            newly = key.suspended_until <= now
+            key.suspended_until = now + self.config.key_suspend_seconds
+            others = [other for other in self.keys if other.suspended_until <= now]
+            if newly:
+                self.suspensions += 1
+        if newly:
+            logger.warning(
+                f"API key {key.label} rejected, suspended for {self.config.key_suspend_seconds:.0f}s "
+                f"({len(others)} of {len(self.keys)} keys left)"
+            )
+        return bool(others)
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests sent and TCP connections opened"""
+    
+    def __init__(self, *args, **kwargs):
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+    
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: self._counting_pool(pool_cls)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+    
+    def _counting_pool(self, pool_cls):
+        """Subclass a urllib3 pool so every (re)connect is counted"""
+        adapter = self
+        
+        class CountingConnection(pool_cls.ConnectionCls):
+            def connect(self):
+                adapter._count("connections_opened")
+                super().connect()
+        
+        return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": CountingConnection})
+    
+    def send(self, request, **kwargs):
+        self._count("requests_sent")
+        return super().send(request, **kwargs)
+
+class BaseWeatherClient:
+    """State shared by the sync and async clients: rate limit, cache, counters
+    
+    Also holds the handling both engines give a response or failure (see
+    _fetched and _fetch_failed), so they can't drift apart.
+    
+    With `shared`, the key pool (rate limits and quota), cache, city index,
+    circuit breaker and hedge policy are another client's rather than new,
+    so both stay within one configured rate. Only the owner closes them.
+    """
+    
+    # Transport errors worth retrying, set per engine
+    TRANSIENT_ERRORS: Tuple[type, ...] = ()
+    
+    def __init__(self, config: PipelineConfig, shared: "BaseWeatherClient" = None):
+        self.config = config
+        self._owns_state = shared is None
+        if shared is not None:
+            self.keys = shared.keys
+            self.cache = shared.cache
+            self.city_index = shared.city_index
+            self.breaker = shared.breaker
+            self.hedging = shared.hedging
+        else:
+            self.keys = KeyPool(config)
+            self.cache = ResponseCache(
+                config.cache_path,
+                ttl=config.cache_ttl,
+                max_entries=config.cache_max_entries,
+                negative_ttl=config.negative_cache_ttl
+            ) if config.cache_enabled else None
+            self.city_index = CityIndex.open_if_exists(config.city_index_path) if config.use_city_index else None
+            self.breaker = CircuitBreaker(
+                failure_threshold=config.breaker_failure_threshold,
+                recovery_timeout=config.breaker_recovery_timeout,
+                success_threshold=config.breaker_success_threshold
+            )
+            self.hedging = HedgePolicy(
+                config.hedge_percentile,
+                budget=config.hedge_budget
+            ) if config.hedge_percentile else None
+        self.deadline: Optional[Deadline] = None  # Set per run by the pipeline
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+    
+    def _count(self, name: str, n: int = 1):
+        with self._counts_lock:
+            self._counts[name] += n
+    
+    def counters(self) -> Dict[str, float]:
+        """Cumulative client counters, diffed per run into PipelineStats"""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        counts["throttled_seconds"] = self.keys.throttled_seconds
+        counts["keys_suspended"] = self.keys.suspensions
+        return counts
+    
+    def _check_circuit(self):
+        """Fail fast, before taking a rate limiter token, while the circuit is open"""
+        if not self.breaker.can_execute():
+            self._count("short_circuited")
+            raise CircuitOpenError("circuit open, request skipped")
+    
+    def _prepare(self, key: ApiKey) -> Tuple[Tuple[float, float], bool]:
+        """Timeouts and breaker admission for a request about to be sent
+        
+        Returns (timeouts, probe) as _timeouts() and _admit(); if the
+        request can't go out, the key's reservation is released.
+        """
+        try:
+            return self._timeouts(), self._admit()
+        except BaseException:
+            self.keys.release(key)
+            raise
+    
+    def _admit(self) -> bool:
+        """Pass the circuit breaker once a token is held
+        
+        Returns whether a HALF_OPEN probe slot was taken, which the caller
+        must release however the request ends.
+        """
+        probe = self.breaker.admit()
+        if probe is None:
+            self._count("short_circuited")
+            raise CircuitOpenError("circuit open, request skipped")
+        return probe
+    
+    def _hedge_key(self) -> Optional[ApiKey]:
+        """A key to send a hedge with, or None if it shouldn't be sent
+        
+        Hedges are only sent while the circuit is closed, within the hedge
+        budget, and with a token that is free now; a hedge that had to
+        queue for the rate limit would start behind its primary.
+        """
+        if self.breaker.state is not CircuitState.CLOSED or not self.hedging.try_hedge():
+            return None
+        key = self.keys.try_acquire()
+        if key is None:
+            self.hedging.release()
+        return key
+    
+    def _timeouts(self) -> Tuple[float, float]:
+        """Connect and read timeouts, shrunk to end by the run deadline"""
+        if self.deadline is None:
+            return self.config.connect_timeout, self.config.read_timeout
+        self.deadline.check()
+        return self.deadline.timeouts(self.config.connect_timeout, self.config.read_timeout)
+    
+    def _out_of_time(self, retry_state) -> bool:
+        """Tenacity stop condition: no retry unless a full attempt fits before the deadline"""
+        return self.deadline is not None and (
+            self.deadline.remaining() < self.config.connect_timeout + self.config.read_timeout
+        )
+    
+    def _check_status(self, key: ApiKey, status: int, retry_after: Optional[str] = None):
+        """Feed a response status to the breaker and the key's rate control
+        
+        Server errors count against the circuit. 429 and 5xx slow the key's
+        rate down and raise RetryLater so the city is requeued rather than
+        failed, as does a 401 while another key can take over.
+        """
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        
+        if status == 429 or status >= 500:
+            self._count("throttled_responses")
+            delay = parse_retry_after(retry_after)
+            key.rate_control.on_throttle(delay)
+            if status == 429:
+                self.keys.cool_down(key, delay)
+            raise RetryLater(f"HTTP {status}", delay)
+        
+        if status == 401 and len(self.keys) > 1:
+            if self.keys.suspend(key):
+                raise KeyRejected(f"HTTP 401 for key {key.label}")
+        
+        key.rate_control.on_success()
+    
+    def _query_params(self, city: str) -> Dict[str, str]:
+        """Query by city ID when the local index resolves the name"""
+        ref = self.city_index.resolve(city) if self.city_index else None
+        return {
+            **({"id": str(ref.id)} if ref else {"q": city}),
+            "units": UNITS
+        }
+    
+    def _city_ids(self, cities: List[str]) -> Dict[str, int]:
+        """Known OpenWeather IDs, from the city index first then the cache"""
+        city_ids = {}
+        if self.city_index:
+            for city in cities:
+                ref = self.city_index.resolve(city)
+                if ref:
+                    city_ids[city] = ref.id
+        
+        unresolved = [city for city in cities if city not in city_ids]
+        if self.cache and unresolved:
+            city_ids.update(self.cache.get_city_ids(unresolved))
+        return city_ids
+    
+    def _known_not_found(self, city: str) -> bool:
+        """Skip cities that recently returned 404 without spending a request"""
+        if self.cache is None or not self.cache.is_not_found(city):
+            return False
+        
+        self._count("not_found_skipped")
+        logger.warning(f"✗ {city}: not found (cached)")
+        return True
+    
+    def _from_cache(self, city: str) -> Optional[WeatherData]:
+        """Return cached weather for a city, or None on a miss"""
+        if self.cache is None:
+            return None
+        
+        hit = self.cache.get(city, UNITS)
+        if hit is None:
+            self._count("cache_misses")
+            return None
+        
+        self._count("cache_hits")
+        body, fetched_at = hit
+        weather, _ = decode_weather(body, WeatherData, fetched_at=fetched_at)
+        logger.info(f"✓ {city}: {weather.temp_celsius}°C, {weather.description} (cached)")
+        return weather
+    
+    def _store(self, city: str, body: bytes, city_id: int):
+        """Cache a city's response body as received, and its ID"""
+        if self.cache is not None:
+            self.cache.put(city, UNITS, body)
+            if city_id:
+                self.cache.put_city_id(city, city_id)
+    
+    def _store_not_found(self, city: str):
+        if self.cache is not None:
+            self.cache.add_not_found(city)
+    
+    def _retrying(self):
+        """Tenacity decorator retrying transport errors and rejected keys in place"""
+        return retry(
+            stop=stop_any(stop_after_attempt(self.config.max_retries), self._out_of_time),
             wait=wait_exponential(
                 multiplier=self.config.base_delay,
                 min=self.config.base_delay,
                 max=self.config.max_delay
             ),
-            retry=retry_if_exception_type((
-                requests.exceptions.Timeout,
-                requests.exceptions.ConnectionError
-            )),
+            retry=retry_if_exception_type((*self.TRANSIENT_ERRORS, KeyRejected)),
             before_sleep=before_sleep_log(logger, logging.WARNING)
-        )(self._fetch_raw)
+        )
     
-    def _fetch_raw(self, city: str) -> Dict[str, Any]:
-        """Raw fetch without retry (retry is applied via decorator)"""
-        self.rate_limiter.wait()
-        
-        response = requests.get(
-            self.config.api_base_url,
-            params={
-                "q": city,
-                "appid": self.config.api_key,
-                "units": "metric"
-            },
-            timeout=self.config.api_timeout
+    def _http_status(self, error: Exception) -> Optional[int]:
+        """Status of an HTTP error response raised by the engine, else None"""
+        return None
+    
+    def _fetched(self, city: str, body: bytes) -> WeatherData:
+        """Decode and cache a city's response"""
+        weather, city_id = decode_weather(body, WeatherData)
+        self._store(city, body, city_id)
+        
+        logger.info(f"✓ {city}: {weather.temp_celsius}°C, {weather.description}")
+        return weather
+    
+    def _fetch_failed(self, city: str, error: Exception, requeue: bool) -> None:
+        """Log why a city's fetch failed, for callers that return None instead
+        
+        With requeue=True, retryable failures (including transport errors)
+        are raised as RetryLater for the caller to schedule. QuotaExhausted
+        is always raised: it ends the run rather than the city.
+        """
+        if isinstance(error, QuotaExhausted):
+            raise error
+        if requeue and isinstance(error, self.TRANSIENT_ERRORS):
+            raise RetryLater(str(error) or type(error).__name__, throttled=False) from error
+        if requeue and isinstance(error, RetryLater):
+            raise error
+        
+        status = self._http_status(error)
+        if status == 404:
+            logger.warning(f"✗ {city}: not found")
+            self._store_not_found(city)
+        elif status is not None:
+            logger.error(f"✗ {city}: HTTP {status}")
+        elif isinstance(error, DeadlineExceeded):
+            self._count("deadline_exceeded")
+            logger.warning(f"✗ {city}: {error}")
+        elif isinstance(error, CircuitOpenError):
+            logger.warning(f"✗ {city}: {error}")
+        elif isinstance(error, RetryLater):
+            logger.error(f"✗ {city}: {error}")
+        else:
+            logger.error(f"✗ {city}: {error!r}")
+        return None
+    
+    def close(self):
+        """Release the cache, index and quota ledger connections (if owned)"""
+        if not self._owns_state:
+            return
+        if self.cache is not None:
+            self.cache.close()
+        if self.city_index is not None:
+            self.city_index.close()
+        if self.keys.ledger is not None:
+            self.keys.ledger.close()
+
+class WeatherAPIClient(BaseWeatherClient):
+    """Client for OpenWeatherMap API
+    
+    Pass `shared` for a per-run view of another client: its own deadline
+    and counters, but that client's connections, in-flight calls and
+    state (see BaseWeatherClient). Closing a view leaves them open.
+    """
+    
+    TRANSIENT_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+    
+    def __init__(self, config: PipelineConfig, shared: "WeatherAPIClient" = None):
+        super().__init__(config, shared)
+        if shared is not None:
+            self.session, self.adapter = shared.session, shared.adapter
+            self.flights = shared.flights
+            self._hedge_pool = shared._hedge_pool
+        else:
+            self.session = self._create_session()
+            self.flights = SingleFlight()
+            # Runs hedged requests so the caller can give up waiting on a slow one
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=2 * max(config.workers, 1),
+                thread_name_prefix="hedge"
+            ) if self.hedging else None
+        self._setup_retry()
+    
+    def __enter__(self) -> "WeatherAPIClient":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _create_session(self) -> requests.Session:
+        """Create a pooled session so connections are reused across calls"""
+        session = requests.Session()
+        self.adapter = CountingHTTPAdapter(
+            pool_connections=self.config.pool_size,
+            pool_maxsize=self.config.pool_per_host,
+            pool_block=True  # Treat pool_per_host as a hard limit
         )
-        response.raise_for_status()
-        return response.json()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        
+        if not self.config.keep_alive:
+            session.headers["Connection"] = "close"
+        
+        return session
     
-    def fetch(self, city: str) -> Optional[WeatherData]:
-        """Fetch weather data for a city"""
-        logger.debug(f"Fetching weather for {city}")
+    def close(self):
+        """Close pooled connections and the cache"""
+        if not self._owns_state:
+            return
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+        super().close()
+    
+    def counters(self) -> Dict[str, float]:
+        counts = super().counters()
+        opened = self.adapter.connections_opened
+        counts["connections_opened"] = opened
+        counts["connections_reused"] = max(self.adapter.requests_sent - opened, 0)
+        counts["coalesced"] = self.flights.coalesced
+        return counts
+    
+    def _setup_retry(self):
+        """Configure retry decorator"""
+        retrying = self._retrying()
+        self._fetch_with_retry = retrying(self._fetch_raw)
+        self._fetch_group_with_retry = retrying(self._fetch_group_raw)
+    
+    def _http_status(self, error: Exception) -> Optional[int]:
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response.status_code
+        return None
+    
+    def _get(self, url: str, params: Dict[str, str]) -> bytes:
+        """Rate-limited GET through the circuit breaker, returning the raw body"""
+        return self._send(self._acquire(), url, params)
+    
+    def _acquire(self) -> ApiKey:
+        """Pass the circuit breaker and take a rate limiter token"""
+        self._check_circuit()
+        return self.keys.acquire(self.deadline)
+    
+    def _send(self, key: ApiKey, url: str, params: Dict[str, str]) -> bytes:
+        """GET with a key whose token has been taken, returning the raw body"""
+        timeouts, probe = self._prepare(key)
         
         try:
-            data = self._fetch_with_retry(city)
-            
-            weather = WeatherData(
-                city=data["name"],
-                country=data["sys"]["country"],
-                temp_celsius=data["main"]["temp"],
-                humidity=data["main"]["humidity"],
-                description=data["weather"][0]["description"],
-                wind_speed=data["wind"]["speed"]
-            )
+            self.keys.record_call(key)
+            try:
+                response = self.session.get(
+                    url,
+                    params={**params, "appid": key.value},
+                    timeout=timeouts
+                )
+            except requests.exceptions.RequestException:
+                self.breaker.record_failure()
+                raise
             
-            logger.info(f"✓ {city}: {weather.temp_celsius}°C, {weather.description}")
+            self._check_status(key, response.status_code, response.headers.get("Retry-After"))
+            response.raise_for_status()
+            return response.content
+        finally:
+            if probe:
+                self.breaker.release_probe()
+    
+    def _fetch_raw(self, city: str) -> bytes:
+        """Raw fetch without retry (retry is applied via decorator)"""
+        params = self._query_params(city)
+        if self.hedging is None:
+            return self._get(self.config.api_base_url, params)
+        return self._hedged(self._acquire(), self.config.api_base_url, params)
+    
+    def _hedged(self, key: ApiKey, url: str, params: Dict[str, str]) -> bytes:
+        """Send a request, and a duplicate if it outlasts the hedge delay
+        
+        The primary's token is already taken, so the hedge clock and the
+        latencies observed cover only time on the wire, not rate limiting.
+        The first successful answer wins; the other is left to finish in
+        the background.
+        """
+        def attempt(key: ApiKey) -> bytes:
+            start = time.monotonic()
+            body = self._send(key, url, params)
+            self.hedging.observe(time.monotonic() - start)
+            return body
+        
+        primary = self._hedge_pool.submit(attempt, key)
+        delay = self.hedging.delay()
+        if delay is None:
+            return primary.result()
+        
+        done, _ = wait([primary], timeout=delay)
+        hedge_key = None if done else self._hedge_key()
+        if hedge_key is None:
+            return primary.result()
+        
+        self._count("hedges_fired")
+        logger.debug(f"Hedging request still unanswered after {delay:.2f}s")
+        hedge = self._hedge_pool.submit(attempt, hedge_key)
+        pending = {primary, hedge}
+        error = None
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedges_won")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+    
+    def _fetch_group_raw(self, city_ids: List[int]) -> List[bytes]:
+        """Fetch current weather for up to GROUP_LIMIT city IDs in one call"""
+        body = self._get(
+            self.config.api_group_url,
+            {
+                "id": ",".join(str(city_id) for city_id in city_ids),
+                "units": UNITS
+            }
+        )
+        return decode_group(body)
+    
+    def fetch(self, city: str, requeue: bool = False) -> Optional[WeatherData]:
+        """Fetch weather data for a city
+        
+        By default transient errors are retried in place by tenacity. With
+        requeue=True a single attempt is made and any retryable failure
+        raises RetryLater for the caller to schedule, so no thread sleeps
+        through a backoff.
+        """
+        logger.debug(f"Fetching weather for {city}")
+        
+        if self._known_not_found(city):
+            return None
+        
+        weather = self._from_cache(city)
+        if weather:
             return weather
-            
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                logger.warning(f"✗ {city}: not found")
+        
+        return self._fetch_uncached(city, requeue)
+    
+    def _fetch_uncached(self, city: str, requeue: bool = False) -> Optional[WeatherData]:
+        """Call the API for a single city, sharing the call with concurrent fetches of it"""
+        return self.flights.do((city_key(city), requeue), lambda: self._fetch_once(city, requeue))
+    
+    def _fetch_once(self, city: str, requeue: bool) -> Optional[WeatherData]:
+        """Call the API for a single city, logging rather than raising errors (see _fetch_failed)"""
+        try:
+            body = self._fetch_raw(city) if requeue else self._fetch_with_retry(city)
+            return self._fetched(city, body)
+        except Exception as e:
+            return self._fetch_failed(city, e, requeue)
+    
+    def fetch_many(
+        self,
+        cities: List[str],
+        executor: Executor = None,
+        on_result: Callable[[str, Optional[WeatherData]], None] = None
+    ) -> List[Optional[WeatherData]]:
+        """Fetch many cities, batching those with known IDs via the group endpoint
+        
+        Cities without a known ID (and any the group call could not answer)
+        fall back to single-city requests. Results keep input order, and
+        `on_result` is called for each city as soon as it is settled.
+        """
+        results: List[Optional[WeatherData]] = [None] * len(cities)
+        pending: Dict[str, List[int]] = {}
+        
+        def settle(indices: List[int], weather: Optional[WeatherData]):
+            for i in indices:
+                results[i] = weather
+                if on_result:
+                    on_result(cities[i], weather)
+        
+        for i, city in enumerate(cities):
+            if self._known_not_found(city):
+                settle([i], None)
+                continue
+            weather = self._from_cache(city)
+            if weather:
+                settle([i], weather)
             else:
-                logger.error(f"✗ {city}: HTTP {e.response.status_code}")
-            return None
-            
+                pending.setdefault(city, []).append(i)
+        
+        city_ids = self._city_ids(list(pending))
+        batched = list(city_ids.items())
+        groups = [
+            batched[start:start + self.config.batch_size]
+            for start in range(0, len(batched), self.config.batch_size)
+        ]
+        logger.info(
+            f"Batching {len(batched)} cities into {len(groups)} group requests, "
+            f"{len(pending) - len(batched)} unresolved cities fetched singly"
+        )
+        
+        mapper = executor.map if executor else map
+        for group_results in mapper(self._fetch_group, groups):
+            for city, weather in group_results.items():
+                settle(pending.pop(city), weather)
+        
+        # Unresolved cities, and anything missing from a group response
+        for city, weather in zip(pending, mapper(self._fetch_uncached, list(pending))):
+            settle(pending[city], weather)
+        
+        return results
+    
+    def _fetch_group(self, group: List[Tuple[str, int]]) -> Dict[str, WeatherData]:
+        """Fetch one group of (city, id) pairs, returning weather by city"""
+        city_ids = [city_id for _, city_id in group]
+        
+        try:
+            for attempt in range(self.config.max_requeues + 1):
+                self._count("group_requests")
+                try:
+                    items = self._fetch_group_with_retry(city_ids)
+                    break
+                except RetryLater:
+                    # The limiter is paused for Retry-After, so just go again
+                    if attempt == self.config.max_requeues:
+                        raise
+                    self._count("requeued")
+        except requests.exceptions.HTTPError as e:
+            logger.warning(f"Group request failed (HTTP {e.response.status_code}), falling back")
+            return {}
+        except PayloadError as e:
+            logger.warning(f"Group request failed ({e}), falling back")
+            return {}
+        except QuotaExhausted:
+            raise
         except Exception as e:
-            logger.error(f"✗ {city}: {e}")
-            return None
\ No newline at end of file
+            logger.error(f"✗ Group of {len(group)} cities: {e}")
+            return {city: None for city, _ in group}
+        
+        by_id = {}
+        for body in items:
+            try:
+                weather, city_id = decode_weather(body, WeatherData)
+            except PayloadError as e:
+                logger.warning(f"Skipping group item: {e}")
+                continue
+            by_id[city_id] = weather, body
+        found = {}
+        
+        for city, city_id in group:
+            if city_id not in by_id:
+                continue
+            weather, body = by_id[city_id]
+            self._store(city, body, city_id)
+            found[city] = weather
+            logger.info(f"✓ {city}: {weather.temp_celsius}°C, {weather.description}")
+        
+        self._count("batched_cities", len(found))
+        return found
\ No newline at end of file
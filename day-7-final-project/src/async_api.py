@@ -0,0 +1,190 @@
+"""Asyncio API client for weather data"""
+
+import asyncio
+import logging
+import time
+from typing import Optional, Dict
+
+import aiohttp
+
+from .config import PipelineConfig
+from .api import ApiKey, BaseWeatherClient, WeatherData
+from .singleflight import AsyncSingleFlight
+from .sources import city_key
+
+logger = logging.getLogger(__name__)
+
+class AsyncWeatherAPIClient(BaseWeatherClient):
+    """Coroutine-based client for OpenWeatherMap API
+    
+    Keeps at most `config.max_concurrency` requests in flight while sharing
+    one rate limiter, so many cities can wait on sockets at the same time.
+    Use as an async context manager so the HTTP session is closed. Pass
+    `shared` to draw on another client's rate limits, cache and breaker
+    (see BaseWeatherClient), and `flights` to coalesce fetches with other
+    clients using the same AsyncSingleFlight.
+    """
+    
+    TRANSIENT_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+    
+    def __init__(
+        self,
+        config: PipelineConfig,
+        shared: BaseWeatherClient = None,
+        flights: AsyncSingleFlight = None
+    ):
+        super().__init__(config, shared)
+        self._semaphore = asyncio.Semaphore(config.max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connections = {"connections_opened": 0, "connections_reused": 0}
+        self.flights = flights or AsyncSingleFlight()
+        self._setup_retry()
+    
+    async def __aenter__(self) -> "AsyncWeatherAPIClient":
+        connector = aiohttp.TCPConnector(
+            limit=self.config.pool_size,
+            limit_per_host=self.config.pool_per_host,
+            keepalive_timeout=self.config.keep_alive_timeout if self.config.keep_alive else None,
+            force_close=not self.config.keep_alive
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.config.connect_timeout,
+                sock_read=self.config.read_timeout
+            ),
+            trace_configs=[self._trace_config()]
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+        self.close()
+    
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Hook connector events to count new vs reused connections"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_create(session, context, params):
+            self._connections["connections_opened"] += 1
+        
+        async def on_reuse(session, context, params):
+            self._connections["connections_reused"] += 1
+        
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+    
+    def counters(self) -> Dict[str, float]:
+        return {**super().counters(), **self._connections, "coalesced": self.flights.coalesced}
+    
+    def _setup_retry(self):
+        """Configure retry decorator (tenacity awaits between attempts)"""
+        self._fetch_with_retry = self._retrying()(self._fetch_raw)
+    
+    def _http_status(self, error: Exception) -> Optional[int]:
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status
+        return None
+    
+    async def _fetch_raw(self, city: str) -> bytes:
+        """Raw fetch without retry, hedged if configured, bounded by the in-flight semaphore"""
+        async with self._semaphore:
+            self._check_circuit()
+            key = await self.keys.acquire_async(self.deadline)
+            if self.hedging is None:
+                return await self._send(key, city)
+            return await self._hedged(key, city)
+    
+    async def _send(self, key: ApiKey, city: str) -> bytes:
+        """One request with a key whose token has been taken"""
+        (connect_timeout, read_timeout), probe = self._prepare(key)
+        
+        try:
+            self.keys.record_call(key)
+            async with self._session.get(
+                self.config.api_base_url,
+                params={**self._query_params(city), "appid": key.value},
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            ) as response:
+                self._check_status(key, response.status, response.headers.get("Retry-After"))
+                response.raise_for_status()
+                return await response.read()
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            self.breaker.record_failure()
+            raise
+        finally:
+            # Also on cancellation, e.g. a hedge that lost
+            if probe:
+                self.breaker.release_probe()
+    
+    async def _hedged(self, key: ApiKey, city: str) -> bytes:
+        """Send a request, and a duplicate if it outlasts the hedge delay
+        
+        The primary already holds its token and semaphore slot, so the hedge
+        clock covers only time on the wire. A hedge shares the primary's
+        slot. The first successful answer wins and the other is cancelled.
+        """
+        async def attempt(key: ApiKey) -> bytes:
+            start = time.monotonic()
+            body = await self._send(key, city)
+            self.hedging.observe(time.monotonic() - start)
+            return body
+        
+        primary = asyncio.ensure_future(attempt(key))
+        delay = self.hedging.delay()
+        if delay is None:
+            return await primary
+        
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        hedge_key = None if done else self._hedge_key()
+        if hedge_key is None:
+            return await primary
+        
+        self._count("hedges_fired")
+        logger.debug(f"{city}: hedging request still unanswered after {delay:.2f}s")
+        hedge = asyncio.ensure_future(attempt(hedge_key))
+        pending = {primary, hedge}
+        error = None
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedges_won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def fetch(self, city: str, requeue: bool = False) -> Optional[WeatherData]:
+        """Fetch weather data for a city (see WeatherAPIClient.fetch)"""
+        logger.debug(f"Fetching weather for {city}")
+        
+        if self._known_not_found(city):
+            return None
+        
+        weather = self._from_cache(city)
+        if weather:
+            return weather
+        
+        return await self.flights.do(
+            (city_key(city), requeue),
+            lambda: self._fetch_uncached(city, requeue)
+        )
+    
+    async def _fetch_uncached(self, city: str, requeue: bool) -> Optional[WeatherData]:
+        """Call the API for a single city, logging rather than raising errors (see _fetch_failed)"""
+        try:
+            if requeue:
+                body = await self._fetch_raw(city)
+            else:
+                body = await self._fetch_with_retry(city)
+            return self._fetched(city, body)
+        except Exception as e:
+            return self._fetch_failed(city, e, requeue)
@@ -0,0 +1,118 @@
+"""Columnar storage for many WeatherData records"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List
+
+import pandas as pd
+import pyarrow as pa
+
+from .api import WeatherData
+
+MICROS = 1_000_000
+
+class _Dictionary:
+    """Strings stored once each, with an int32 code per record"""
+    
+    def __init__(self):
+        self.codes = array("i")
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+    
+    def append(self, value: str):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+    
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+    
+    def to_arrow(self) -> pa.DictionaryArray:
+        return pa.DictionaryArray.from_arrays(_arrow_view(pa.int32(), self.codes), pa.array(self.values, pa.string()))
+
+def _arrow_view(type: pa.DataType, column: array) -> pa.Array:
+    """Arrow array over an array.array's memory (no copy)"""
+    return pa.Array.from_buffers(type, len(column), [None, pa.py_buffer(column)])
+
+class WeatherBatch:
+    """WeatherData stored as columns rather than one object per record
+    
+    Numbers live in array.array columns, the fetch time as int64 epoch
+    microseconds, and country and description, which repeat, are stored
+    once each with an int32 code per record. to_arrow() shares the
+    numeric, timestamp and code columns' memory rather than copying it;
+    to_pandas() shares the numeric and timestamp columns, but pandas
+    copies the codes into its own (narrowest) integer type. While such a
+    table or frame is alive, the batch can't grow: appending raises
+    BufferError.
+    """
+    
+    ARROW_SCHEMA = pa.schema([
+        ("city", pa.string()),
+        ("country", pa.dictionary(pa.int32(), pa.string())),
+        ("temp_celsius", pa.float64()),
+        ("humidity", pa.int64()),
+        ("description", pa.dictionary(pa.int32(), pa.string())),
+        ("wind_speed", pa.float64()),
+        ("fetched_at", pa.timestamp("us", tz="UTC")),
+    ])
+    
+    def __init__(self, records: Iterable[WeatherData] = ()):
+        self.city: List[str] = []
+        self.country = _Dictionary()
+        self.temp_celsius = array("d")
+        self.humidity = array("q")
+        self.description = _Dictionary()
+        self.wind_speed = array("d")
+        self.fetched_at = array("q")
+        self.extend(records)
+    
+    def append(self, weather: WeatherData):
+        self.city.append(weather.city)
+        self.country.append(weather.country)
+        self.temp_celsius.append(weather.temp_celsius)
+        self.humidity.append(weather.humidity)
+        self.description.append(weather.description)
+        self.wind_speed.append(weather.wind_speed)
+        self.fetched_at.append(round(weather.fetched_at * MICROS))
+    
+    def extend(self, records: Iterable[WeatherData]):
+        for weather in records:
+            self.append(weather)
+    
+    def __len__(self) -> int:
+        return len(self.city)
+    
+    def __getitem__(self, i: int) -> WeatherData:
+        return WeatherData(
+            city=self.city[i],
+            country=self.country[i],
+            temp_celsius=self.temp_celsius[i],
+            humidity=self.humidity[i],
+            description=self.description[i],
+            wind_speed=self.wind_speed[i],
+            fetched_at=self.fetched_at[i] / MICROS
+        )
+    
+    def __iter__(self) -> Iterator[WeatherData]:
+        return (self[i] for i in range(len(self)))
+    
+    def to_dicts(self) -> List[Dict]:
+        """Records as WeatherData.to_dict() would give them, e.g. for DataWriter"""
+        return [weather.to_dict() for weather in self]
+    
+    def to_arrow(self) -> pa.Table:
+        return pa.Table.from_arrays([
+            pa.array(self.city, pa.string()),
+            self.country.to_arrow(),
+            _arrow_view(pa.float64(), self.temp_celsius),
+            _arrow_view(pa.int64(), self.humidity),
+            self.description.to_arrow(),
+            _arrow_view(pa.float64(), self.wind_speed),
+            _arrow_view(pa.timestamp("us", tz="UTC"), self.fetched_at),
+        ], schema=self.ARROW_SCHEMA)
+    
+    def to_pandas(self) -> pd.DataFrame:
+        """DataFrame with categorical country/description and a UTC fetched_at"""
+        return self.to_arrow().to_pandas(split_blocks=True)
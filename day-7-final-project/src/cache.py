@@ -0,0 +1,214 @@
+"""Persistent response cache for weather lookups"""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+from .sources import city_key
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """SQLite cache of API payloads keyed by city and units
+    
+    Entries older than `ttl` seconds are treated as missing. Once more than
+    `max_entries` are stored, the least recently used ones are evicted
+    (checked every EVICT_EVERY writes so puts stay cheap). WAL mode lets
+    several processes share the same cache file.
+    
+    Cities the API answered with 404 are kept in a separate negative cache
+    for `negative_ttl` seconds so they can be skipped without a request.
+    City IDs seen in responses are kept without expiry so later runs can
+    use the batched group endpoint.
+    """
+    
+    EVICT_EVERY = 100
+    
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = 600,
+        max_entries: int = 10000,
+        negative_ttl: float = 7 * 24 * 3600
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            str(self.path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                city TEXT NOT NULL,
+                units TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (city, units)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS not_found (
+                city TEXT PRIMARY KEY,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS city_ids (
+                city TEXT PRIMARY KEY,
+                id INTEGER NOT NULL
+            )
+        """)
+        self._writes = 0
+        self.evict()
+    
+    def get(self, city: str, units: str) -> Optional[Tuple[str, float]]:
+        """Return (payload JSON, fetched_at) if a fresh entry exists"""
+        key = city_key(city)
+        now = time.time()
+        
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT payload, fetched_at FROM responses WHERE city = ? AND units = ?",
+                (key, units)
+            ).fetchone()
+            
+            if row is None or now - row[1] > self.ttl:
+                return None
+            
+            self.conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE city = ? AND units = ?",
+                (now, key, units)
+            )
+        
+        return row[0], row[1]
+    
+    def fetched_times(self, cities: List[str], units: str) -> Dict[str, float]:
+        """When each city was last fetched, expired entries included"""
+        found = {}
+        
+        with self._lock:
+            for city in cities:
+                row = self.conn.execute(
+                    "SELECT fetched_at FROM responses WHERE city = ? AND units = ?",
+                    (city_key(city), units)
+                ).fetchone()
+                if row:
+                    found[city] = row[0]
+        
+        return found
+    
+    def put(self, city: str, units: str, payload: Union[Dict[str, Any], bytes, str]):
+        """Store a payload (or its raw JSON), evicting periodically"""
+        if isinstance(payload, dict):
+            payload = json.dumps(payload)
+        elif not isinstance(payload, str):
+            payload = bytes(payload).decode()
+        now = time.time()
+        
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (city_key(city), units, payload, now, now)
+            )
+            self._writes += 1
+        
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+    
+    def evict(self) -> int:
+        """Drop least recently used entries beyond max_entries"""
+        with self._lock:
+            evicted = self.conn.execute(
+                """
+                DELETE FROM responses WHERE rowid IN (
+                    SELECT rowid FROM responses
+                    ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            ).rowcount
+        
+        if evicted:
+            logger.debug(f"Evicted {evicted} cached responses")
+        return evicted
+    
+    def get_city_ids(self, cities: List[str]) -> Dict[str, int]:
+        """Map cities to OpenWeather IDs learned from earlier responses"""
+        found = {}
+        
+        with self._lock:
+            for city in cities:
+                row = self.conn.execute(
+                    "SELECT id FROM city_ids WHERE city = ?", (city_key(city),)
+                ).fetchone()
+                if row:
+                    found[city] = row[0]
+        
+        return found
+    
+    def put_city_id(self, city: str, city_id: int):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO city_ids VALUES (?, ?)",
+                (city_key(city), city_id)
+            )
+    
+    def is_not_found(self, city: str) -> bool:
+        """Check whether the API recently returned 404 for a city"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT recorded_at FROM not_found WHERE city = ?",
+                (city_key(city),)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.negative_ttl
+    
+    def add_not_found(self, city: str):
+        """Remember that the API returned 404 for a city"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO not_found VALUES (?, ?)",
+                (city_key(city), time.time())
+            )
+    
+    def list_not_found(self) -> List[Tuple[str, float]]:
+        """Return (city, recorded_at) for unexpired negative entries"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT city, recorded_at FROM not_found WHERE recorded_at >= ? ORDER BY city",
+                (time.time() - self.negative_ttl,)
+            ).fetchall()
+    
+    def purge_not_found(self, cities: List[str] = None) -> int:
+        """Remove negative entries for the given cities, or all of them"""
+        with self._lock:
+            if not cities:
+                return self.conn.execute("DELETE FROM not_found").rowcount
+            return self.conn.executemany(
+                "DELETE FROM not_found WHERE city = ?",
+                [(city_key(city),) for city in cities]
+            ).rowcount
+    
+    def clear(self) -> int:
+        """Remove all cached responses"""
+        with self._lock:
+            return self.conn.execute("DELETE FROM responses").rowcount
+    
+    def close(self):
+        self.conn.close()
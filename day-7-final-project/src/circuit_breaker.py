@@ -0,0 +1,111 @@
+"""Circuit breaker for API calls"""
+
+import threading
+import time
+import logging
+from enum import Enum
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(Enum):
+    CLOSED = "closed"      # Normal operation
+    OPEN = "open"          # Failing, reject requests
+    HALF_OPEN = "half_open"  # Testing if recovered
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while the circuit is open"""
+
+class CircuitBreaker:
+    """
+    Circuit breaker pattern implementation (thread-safe)
+    
+    States:
+    - CLOSED: Normal operation, requests pass through
+    - OPEN: Service is down, fail fast without trying
+    - HALF_OPEN: Testing if service recovered, with at most
+      `success_threshold` probe requests in flight
+    
+    A probe slot taken by admit() must be handed back with release_probe()
+    however the call ends, or HALF_OPEN stops letting requests through.
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+        success_threshold: int = 2
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.success_threshold = success_threshold
+        
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.successes = 0
+        self.probes = 0
+        self.last_failure_time = None
+        self._lock = threading.Lock()
+    
+    def can_execute(self) -> bool:
+        """Check if we should attempt the operation, without claiming a probe slot"""
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                # Check if recovery timeout has passed
+                return time.monotonic() - self.last_failure_time >= self.recovery_timeout
+            if self.state == CircuitState.HALF_OPEN:
+                return self.probes < self.success_threshold
+            return True
+    
+    def admit(self) -> Optional[bool]:
+        """Let a call through: None if refused, True if it took a probe slot"""
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return False
+            
+            if self.state == CircuitState.OPEN:
+                if time.monotonic() - self.last_failure_time < self.recovery_timeout:
+                    return None
+                logger.info("Circuit breaker: OPEN -> HALF_OPEN (testing recovery)")
+                self.state = CircuitState.HALF_OPEN
+                self.successes = 0
+                self.probes = 0
+            
+            if self.probes >= self.success_threshold:
+                return None
+            self.probes += 1
+            return True
+    
+    def release_probe(self):
+        """Hand back a probe slot taken by admit()"""
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN:
+                self.probes = max(self.probes - 1, 0)
+    
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN:
+                self.successes += 1
+                if self.successes >= self.success_threshold:
+                    logger.info("Circuit breaker: HALF_OPEN -> CLOSED (recovered)")
+                    self.state = CircuitState.CLOSED
+                    self.failures = 0
+                    self.successes = 0
+                    self.probes = 0
+            else:
+                self.failures = 0
+    
+    def record_failure(self):
+        """Record a failed call"""
+        with self._lock:
+            self.failures += 1
+            self.last_failure_time = time.monotonic()
+            
+            if self.state == CircuitState.HALF_OPEN:
+                logger.warning("Circuit breaker: HALF_OPEN -> OPEN (still failing)")
+                self.state = CircuitState.OPEN
+                self.successes = 0
+            elif self.state == CircuitState.CLOSED and self.failures >= self.failure_threshold:
+                logger.warning(f"Circuit breaker: CLOSED -> OPEN (threshold reached: {self.failures} failures)")
+                self.state = CircuitState.OPEN
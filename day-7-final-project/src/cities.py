@@ -0,0 +1,130 @@
+"""Local city name to ID/coordinate index"""
+
+import gzip
+import json
+import sqlite3
+import threading
+import unicodedata
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+from .sources import city_key
+
+logger = logging.getLogger(__name__)
+
+def normalize_name(name: str) -> str:
+    """city_key() that also ignores accents ("Zürich " -> "zurich")"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return city_key("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+def split_country(query: str) -> Tuple[str, Optional[str]]:
+    """Split "London,GB" into ("London", "GB")"""
+    name, _, country = query.partition(",")
+    return name, country.strip().upper() or None
+
+@dataclass(frozen=True)
+class CityRef:
+    """A resolved city"""
+    id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+
+class CityIndex:
+    """SQLite index of the OpenWeather bulk city list
+    
+    Built once with `build()` from city.list.json(.gz) (see
+    http://bulk.openweathermap.org/sample/), then opened read-only for
+    lookups. Names may be qualified with a country code, e.g. "London,GB".
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._memo: Dict[str, List[CityRef]] = {}
+        self.conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+    
+    @classmethod
+    def open_if_exists(cls, path: Path) -> Optional["CityIndex"]:
+        """Open the index, or return None if it hasn't been built"""
+        if path is None or not Path(path).exists():
+            return None
+        return cls(path)
+    
+    @staticmethod
+    def build(source: Path, path: Path) -> int:
+        """Build an index from a bulk city list and return the number of cities"""
+        source, path = Path(source), Path(path)
+        opener = gzip.open if source.suffix == ".gz" else open
+        with opener(source, "rt", encoding="utf-8") as f:
+            cities = json.load(f)
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.unlink(missing_ok=True)
+        
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("""
+            CREATE TABLE cities (
+                key TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                country TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                PRIMARY KEY (key, id)
+            ) WITHOUT ROWID
+        """)
+        conn.executemany(
+            "INSERT OR IGNORE INTO cities VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    normalize_name(city["name"]),
+                    city["id"],
+                    city["name"],
+                    city.get("country", ""),
+                    city["coord"]["lat"],
+                    city["coord"]["lon"]
+                )
+                for city in cities
+                if city.get("name")
+            )
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+        tmp_path.replace(path)
+        
+        logger.info(f"Indexed {len(cities)} cities into {path}")
+        return len(cities)
+    
+    def lookup(self, query: str) -> List[CityRef]:
+        """Return all cities matching a (optionally country-qualified) name"""
+        name, country = split_country(query)
+        key = normalize_name(name)
+        
+        with self._lock:
+            if key not in self._memo:
+                rows = self.conn.execute(
+                    "SELECT id, name, country, lat, lon FROM cities WHERE key = ? ORDER BY id",
+                    (key,)
+                ).fetchall()
+                self._memo[key] = [CityRef(*row) for row in rows]
+            matches = self._memo[key]
+        
+        if country:
+            matches = [ref for ref in matches if ref.country == country]
+        return matches
+    
+    def resolve(self, query: str) -> Optional[CityRef]:
+        """Return the city if the query matches exactly one entry"""
+        matches = self.lookup(query)
+        return matches[0] if len(matches) == 1 else None
+    
+    def close(self):
+        self.conn.close()
@@ -1,14 +1,24 @@
 """Command-line interface"""
 
 import argparse
+import json
+import glob
+import itertools
 import logging
 import sys
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 from .config import PipelineConfig
-from .pipeline import WeatherPipeline
-from .formats import DataReader, DataWriter
+from .cache import ResponseCache
+from .api import GROUP_LIMIT, WeatherData
+from .cities import CityIndex
+from .journal import RunJournal
+from .pipeline import PipelineStats, WeatherPipeline
+from .sources import STDIN, Deduplicator, city_key, in_shard, unique_cities
+from .formats import METADATA_SUFFIX, DataReader, DataWriter, arrow_schema, cast_record
+from .quota import QuotaLedger, key_id
 
 def setup_logging(verbose: bool, log_dir: Path):
     """Configure logging"""
@@ -36,12 +46,73 @@ def setup_logging(verbose: bool, log_dir: Path):
     
     return log_file
 
-def cmd_fetch(args):
-    """Handle fetch command"""
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse "I/N" for --shard"""
+    try:
+        shard, shards = map(int, value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got {value!r}")
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError(f"shard must be between 1 and {shards}")
+    return shard, shards
+
+def parse_duration(value: str) -> float:
+    """Parse "300", "90s", "5m" or "1h" into seconds"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    scale = units.get(value[-1:].lower(), 1)
+    try:
+        seconds = float(value[:-1] if value[-1:].lower() in units else value) * scale
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a duration like 300, 90s or 5m, got {value!r}")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("duration must be positive")
+    return seconds
+
+def expand_paths(specs: List[str]) -> List[Path]:
+    """Expand glob patterns (for shells that don't), keeping plain paths as given"""
+    return [Path(path) for spec in specs for path in (sorted(glob.glob(str(spec))) or [spec])]
+
+def config_from_args(args) -> Optional[PipelineConfig]:
+    """Build the pipeline config from shared fetch options, or None if invalid"""
     config = PipelineConfig()
+    config.engine = args.engine
+    config.max_concurrency = args.concurrency
+    config.workers = args.workers
+    config.batch_size = args.batch_size
+    if args.calls_per_second:
+        config.calls_per_second = args.calls_per_second
+    if args.burst:
+        config.rate_limit_burst = args.burst
+    config.adaptive_rate = args.adaptive
+    if args.max_calls_per_second:
+        config.max_calls_per_second = args.max_calls_per_second
+    if args.shared_rate_limit:
+        config.rate_limit_file = args.shared_rate_limit
+    if args.hedge:
+        config.hedge_percentile = args.hedge
+    if args.deadline:
+        config.deadline = args.deadline
+    if args.connect_timeout:
+        config.connect_timeout = args.connect_timeout
+    if args.read_timeout:
+        config.read_timeout = args.read_timeout
+    config.cache_enabled = not args.no_cache
+    config.use_city_index = not args.no_index
     
     if not config.validate():
-        print("Error: OPENWEATHER_API_KEY not set")
+        print("Error: OPENWEATHER_API_KEY (or OPENWEATHER_API_KEYS) not set")
+        return None
+    
+    if config.batch_size and config.engine == "async":
+        print("Error: --batch-size is only supported with --engine sync")
+        return None
+    
+    return config
+
+def cmd_fetch(args):
+    """Handle fetch command"""
+    config = config_from_args(args)
+    if config is None:
         return 1
     
     log_file = setup_logging(args.verbose, config.log_dir)
@@ -52,23 +123,56 @@ def cmd_fetch(args):
     logger.info("=" * 50)
     
     pipeline = WeatherPipeline(config)
+    journal = None
+    saved = False
+    sink = None
     
     try:
         # Get cities
-        if args.cities:
-            cities = [c.strip() for c in args.cities.split(",")]
-        elif args.file:
-            cities = pipeline.load_cities_from_file(args.file)
+        if args.resume:
+            journal = RunJournal.open(config.runs_dir, args.resume)
+            cities = journal.inputs()
+            sources = journal.sources()
+            if STDIN in sources:
+                logger.warning("Standard input can't be re-read; resuming only the cities read from it before")
+                sources = [source for source in sources if source != STDIN]
+            if sources:
+                more = pipeline.city_source(*sources, exclude=cities)
+                if journal.shard():
+                    more = in_shard(more, *journal.shard())
+                cities = itertools.chain(cities, journal.track(more))
+        elif args.cities or args.file:
+            if args.cities:
+                cities = unique_cities(args.cities.split(","))
+            else:
+                cities = pipeline.city_source(*args.file)
+            if args.shard:
+                cities = in_shard(cities, *args.shard)
+                logger.info(f"Fetching shard {args.shard[0]} of {args.shard[1]}")
+            journal = RunJournal.create(config.runs_dir, args.file, args.shard)
+            cities = journal.track(cities)
         else:
-            print("Error: Must provide --cities or --file")
+            print("Error: Must provide --cities, --file or --resume")
             return 1
         
-        # Run pipeline
-        results = pipeline.fetch_weather(cities)
+        logger.info(f"Run ID: {journal.run_id}")
+        
+        # Run pipeline, streaming records straight to the output where the
+        # format allows it
+        output_path = Path(args.output)
+        if args.format in DataWriter.SINKS:
+            sink = DataWriter.open(output_path, args.format, schema=arrow_schema(WeatherData, fetched_at=str))
+        results = pipeline.fetch_weather(cities, journal, sink)
         
         # Save results
-        if results:
-            output_path = Path(args.output)
+        if sink:
+            sink.close()
+            if not sink.count:
+                print("\n✗ No data to save")
+                return 1
+            DataWriter.write_metadata(output_path, pipeline.metadata(sink.count))
+            print(f"\n✓ Saved {sink.count} records to {output_path}")
+        elif results:
             pipeline.save_results(results, output_path, args.format)
             
             print(f"\n✓ Saved {len(results)} records to {output_path}")
@@ -82,11 +186,140 @@ def cmd_fetch(args):
             print(f"  {key}: {value}")
         
         print(f"\nLog file: {log_file}")
+        saved = True
         return 0
         
+    except KeyboardInterrupt:
+        logger.warning("Interrupted")
+        return 130
+        
     except Exception as e:
         logger.exception(f"Pipeline failed: {e}")
         return 1
+        
+    finally:
+        if sink:
+            sink.close()
+        if journal:
+            stats = pipeline.stats
+            if saved and not (stats.failed or stats.deferred or pipeline.deadline_reached):
+                # Nothing left to resume
+                journal.delete()
+            else:
+                journal.close()
+                print(f"\nResume with: python -m src.cli fetch --resume {journal.run_id}")
+
+def cmd_batch(args):
+    """Handle batch command"""
+    config = config_from_args(args)
+    if config is None:
+        return 1
+    
+    list_paths = expand_paths(args.lists)
+    output_dir = Path(args.output_dir) if args.output_dir else config.output_dir
+    outputs = {path: output_dir / f"{path.stem}.{args.format}" for path in list_paths}
+    if len(set(outputs.values())) < len(outputs):
+        print("Error: City lists must have distinct file names")
+        return 1
+    
+    log_file = setup_logging(args.verbose, config.log_dir)
+    logger = logging.getLogger(__name__)
+    
+    logger.info("=" * 50)
+    logger.info("Weather Pipeline - Batch Command")
+    logger.info("=" * 50)
+    
+    pipeline = WeatherPipeline(config)
+    
+    try:
+        results = pipeline.fetch_lists(list_paths)
+        
+        print()
+        for path, weather in results.items():
+            pipeline.save_results(weather, outputs[path], args.format)
+            print(f"✓ {path.name}: saved {len(weather)} records to {outputs[path]}")
+        
+        print(f"\n=== Statistics ===")
+        for key, value in pipeline.stats.to_dict().items():
+            print(f"  {key}: {value}")
+        
+        print(f"\nLog file: {log_file}")
+        return 0 if pipeline.stats.success else 1
+        
+    except Exception as e:
+        logger.exception(f"Batch failed: {e}")
+        return 1
+
+def cmd_merge(args):
+    """Handle merge command"""
+    input_paths = [
+        path for path in expand_paths(args.inputs)
+        if not path.name.endswith(METADATA_SUFFIX) and path != args.output
+    ]
+    missing = [path for path in input_paths if not path.exists()]
+    if missing:
+        print(f"Error: Input file not found: {missing[0]}")
+        return 1
+    
+    format = args.format or args.output.suffix.lstrip(".")
+    if format not in DataWriter.SUPPORTED_FORMATS:
+        print(f"Error: Unsupported format: {format}")
+        return 1
+    
+    # One record per city; a city fetched by more than one shard keeps
+    # the first copy seen. CSV values are read back as strings, so every
+    # record is cast to WeatherData's field types.
+    dedupe = Deduplicator()
+    counts = {"read": 0, "duplicates": 0}
+    
+    def records():
+        for path in input_paths:
+            for record in DataReader.iter(path):
+                counts["read"] += 1
+                if dedupe.seen(f"{city_key(str(record['city']))},{record.get('country', '')}"):
+                    counts["duplicates"] += 1
+                    continue
+                yield cast_record(record, WeatherData, fetched_at=str)
+    
+    try:
+        if format in DataWriter.SINKS:
+            with DataWriter.open(args.output, format, schema=arrow_schema(WeatherData, fetched_at=str)) as sink:
+                for record in records():
+                    sink.write(record)
+            written = sink.count
+        else:
+            data = list(records())
+            written = len(data)
+        
+        shard_stats = [
+            metadata["stats"]
+            for metadata in map(DataReader.read_metadata, input_paths)
+            if metadata and "stats" in metadata
+        ]
+        metadata = {
+            "generated_at": datetime.now().isoformat(),
+            "record_count": written,
+            "inputs": [str(path) for path in input_paths],
+            "stats": PipelineStats.combine(shard_stats)
+        }
+        if format == "json":
+            # Wrap like a fetch output so the stats travel with the data
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps({"metadata": metadata, "data": data}, indent=2))
+        else:
+            DataWriter.write_metadata(args.output, metadata)
+        
+        print(f"✓ Merged {written} records from {len(input_paths)} files into {args.output}")
+        print(f"  Duplicates dropped: {counts['duplicates']} of {counts['read']}")
+        if shard_stats:
+            print(f"\n=== Combined statistics ({len(shard_stats)} runs) ===")
+            for key, value in metadata["stats"].items():
+                print(f"  {key}: {value}")
+        return 0
+        
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
 
 def cmd_convert(args):
     """Handle convert command"""
@@ -140,6 +373,80 @@ def cmd_info(args):
         print(f"Error: {e}")
         return 1
 
+def cmd_cache(args):
+    """Handle cache command"""
+    config = PipelineConfig()
+    cache = ResponseCache(config.cache_path, negative_ttl=config.negative_cache_ttl)
+    
+    try:
+        if args.action == "not-found":
+            entries = cache.list_not_found()
+            print(f"\n=== Cities cached as not found ({len(entries)}) ===")
+            for city, recorded_at in entries:
+                print(f"  {city} (since {datetime.fromtimestamp(recorded_at):%Y-%m-%d %H:%M})")
+        elif args.action == "purge-not-found":
+            removed = cache.purge_not_found(args.cities)
+            print(f"✓ Removed {removed} not-found entries")
+        elif args.action == "clear":
+            removed = cache.clear()
+            print(f"✓ Removed {removed} cached responses")
+        return 0
+        
+    finally:
+        cache.close()
+
+def cmd_quota(args):
+    """Handle quota command"""
+    config = PipelineConfig()
+    if not config.validate():
+        print("Error: OPENWEATHER_API_KEY (or OPENWEATHER_API_KEYS) not set")
+        return 1
+    
+    ledger = QuotaLedger(config.quota_path, config.quota_limits())
+    keys = config.all_api_keys()
+    
+    try:
+        print(f"\n=== API quota ({len(keys)} key{'s' if len(keys) > 1 else ''}) ===")
+        for key in keys:
+            used = ledger.used(key_id(key))
+            remaining = ledger.remaining(key_id(key))
+            print(f"  …{key[-4:]}:")
+            for period, limit in config.quota_limits().items():
+                left = "no cap" if limit is None else f"{remaining[period]:,} of {limit:,} left"
+                print(f"    this {period:<6} {used[period]:>9,} calls  ({left})")
+        
+        left = ledger.calls_left(key_id(key) for key in keys)
+        if left is not None:
+            print(f"\n  {left:,} calls left today/this month across all keys")
+        return 0
+        
+    finally:
+        ledger.close()
+
+def cmd_index(args):
+    """Handle index command"""
+    config = PipelineConfig()
+    
+    if args.action == "build":
+        if not args.source or not args.source.exists():
+            print("Error: Provide the bulk city list, e.g. city.list.json.gz")
+            return 1
+        count = CityIndex.build(args.source, config.city_index_path)
+        print(f"✓ Indexed {count:,} cities into {config.city_index_path}")
+        return 0
+    
+    index = CityIndex.open_if_exists(config.city_index_path)
+    if index is None:
+        print(f"Error: City index not built: {config.city_index_path}")
+        return 1
+    
+    matches = index.lookup(args.name)
+    print(f"\n=== {len(matches)} matches for '{args.name}' ===")
+    for ref in matches:
+        print(f"  {ref.id}: {ref.name}, {ref.country} ({ref.lat}, {ref.lon})")
+    index.close()
+    return 0 if matches else 1
+
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(
@@ -153,26 +460,118 @@ Examples:
   # Fetch from file
   python -m src.cli fetch --file data/cities.txt --output weather.parquet --format parquet
 
+  # Fetch from several files, a glob, or stdin (duplicates are skipped)
+  python -m src.cli fetch --file "data/*.txt"
+  cat data/cities.txt | python -m src.cli fetch --file - --format jsonl
+
+  # Fetch a large list concurrently
+  python -m src.cli fetch --file data/cities.txt --engine async --concurrency 20
+  python -m src.cli fetch --file data/cities.txt --workers 8 --calls-per-second 10
+
+  # Find the highest sustainable rate automatically
+  python -m src.cli fetch --file data/cities.txt --workers 8 --adaptive --max-calls-per-second 20
+
+  # Finish within a 5 minute cron slot, saving whatever was fetched
+  python -m src.cli fetch --file data/cities.txt --format jsonl --deadline 5m
+
+  # Pick up an interrupted run where it stopped (run ID is logged at start)
+  python -m src.cli fetch --resume 20240101-120000-4242
+
+  # Batch up to 20 cities per request once their IDs are known
+  python -m src.cli fetch --file data/cities.txt --batch-size 20
+
+  # Fetch several lists at once; shared cities are requested once
+  python -m src.cli batch data/city_lists/*.txt --output-dir output/lists --workers 8
+
+  # Split a large list over 4 machines, then combine their outputs
+  python -m src.cli fetch --file data/cities.txt --shard 1/4 --output output/shard-1.jsonl --format jsonl
+  python -m src.cli merge output/shard-*.jsonl --output weather.parquet
+
   # Convert between formats
   python -m src.cli convert weather.json weather.csv --format csv
 
   # Get file info
   python -m src.cli info weather.parquet
+
+  # Build the local city index, then look a name up
+  python -m src.cli index build city.list.json.gz
+  python -m src.cli index lookup "Zurich"
+
+  # Show API calls used and left per key this minute, day and month
+  python -m src.cli quota
+
+  # List or purge cities cached as not found
+  python -m src.cli cache not-found
+  python -m src.cli cache purge-not-found InvalidCity123
         """
     )
     
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
+    # Options shared by fetch and batch
+    fetch_options = argparse.ArgumentParser(add_help=False)
+    fetch_options.add_argument("--format", choices=["json", "csv", "parquet", "jsonl"], default="json")
+    fetch_options.add_argument("--engine", choices=["sync", "async"], default="sync",
+                               help="Fetch engine (async needs aiohttp)")
+    fetch_options.add_argument("--concurrency", type=int, default=10,
+                               help="Max in-flight requests for --engine async")
+    fetch_options.add_argument("--workers", "-w", type=int, default=1,
+                               help="Worker threads for --engine sync")
+    fetch_options.add_argument("--batch-size", type=int, default=0, choices=range(0, GROUP_LIMIT + 1),
+                               metavar=f"0-{GROUP_LIMIT}",
+                               help="Fetch cities with known IDs in groups of this size")
+    fetch_options.add_argument("--calls-per-second", type=float,
+                               help="Override the API rate limit")
+    fetch_options.add_argument("--burst", type=int,
+                               help="Calls allowed back-to-back before rate limiting")
+    fetch_options.add_argument("--adaptive", action="store_true",
+                               help="Raise the rate while healthy, back off on 429/5xx")
+    fetch_options.add_argument("--max-calls-per-second", type=float,
+                               help="Upper bound for --adaptive")
+    fetch_options.add_argument("--shared-rate-limit", type=Path, metavar="FILE",
+                               help="State file for a rate limit shared by parallel processes")
+    fetch_options.add_argument("--hedge", type=float, metavar="PERCENTILE",
+                               help="Duplicate requests slower than this latency percentile, e.g. 95")
+    fetch_options.add_argument("--deadline", type=parse_duration, metavar="DURATION",
+                               help="Stop starting cities after this long (e.g. 300, 5m) and save what was fetched")
+    fetch_options.add_argument("--connect-timeout", type=float, metavar="SECONDS",
+                               help="Timeout for connecting to the API")
+    fetch_options.add_argument("--read-timeout", type=float, metavar="SECONDS",
+                               help="Timeout for each read of an API response")
+    fetch_options.add_argument("--no-cache", action="store_true",
+                               help="Always call the API instead of using cached responses")
+    fetch_options.add_argument("--no-index", action="store_true",
+                               help="Send city names to the API instead of resolving them locally")
+    fetch_options.add_argument("--verbose", "-v", action="store_true")
+    
     # Fetch command
-    fetch_parser = subparsers.add_parser("fetch", help="Fetch weather data")
+    fetch_parser = subparsers.add_parser("fetch", help="Fetch weather data", parents=[fetch_options])
     fetch_input = fetch_parser.add_mutually_exclusive_group(required=True)
     fetch_input.add_argument("--cities", "-c", help="Comma-separated cities")
-    fetch_input.add_argument("--file", "-f", type=Path, help="File with cities")
+    fetch_input.add_argument("--file", "-f", nargs="+", metavar="FILE",
+                             help="Files or glob patterns with one city per line ('-' for stdin)")
+    fetch_input.add_argument("--resume", metavar="RUN_ID",
+                             help="Finish an interrupted run, fetching only missing cities")
     fetch_parser.add_argument("--output", "-o", default="output/weather.json", help="Output file")
-    fetch_parser.add_argument("--format", choices=["json", "csv", "parquet", "jsonl"], default="json")
-    fetch_parser.add_argument("--verbose", "-v", action="store_true")
+    fetch_parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                              help="Fetch only the cities hashed to shard I of N (1-based)")
     fetch_parser.set_defaults(func=cmd_fetch)
     
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Fetch several city lists in one run",
+                                         parents=[fetch_options])
+    batch_parser.add_argument("lists", nargs="+", help="City list files or glob patterns")
+    batch_parser.add_argument("--output-dir", "-o", type=Path,
+                              help="Directory for one output file per list (default: output/)")
+    batch_parser.set_defaults(func=cmd_batch)
+    
+    # Merge command
+    merge_parser = subparsers.add_parser("merge", help="Combine shard outputs into one dataset")
+    merge_parser.add_argument("inputs", nargs="+", help="Output files or glob patterns to merge")
+    merge_parser.add_argument("--output", "-o", type=Path, required=True, help="Merged output file")
+    merge_parser.add_argument("--format", choices=["json", "csv", "parquet", "jsonl"])
+    merge_parser.set_defaults(func=cmd_merge)
+    
     # Convert command
     convert_parser = subparsers.add_parser("convert", help="Convert between formats")
     convert_parser.add_argument("input", type=Path, help="Input file")
@@ -185,6 +584,25 @@ Examples:
     info_parser.add_argument("input", type=Path, help="Input file")
     info_parser.set_defaults(func=cmd_info)
     
+    # Cache command
+    cache_parser = subparsers.add_parser("cache", help="Inspect or purge the response cache")
+    cache_parser.add_argument("action", choices=["not-found", "purge-not-found", "clear"])
+    cache_parser.add_argument("cities", nargs="*", help="Cities to purge (default: all)")
+    cache_parser.set_defaults(func=cmd_cache)
+    
+    # Quota command
+    quota_parser = subparsers.add_parser("quota", help="Show API quota used and remaining")
+    quota_parser.set_defaults(func=cmd_quota)
+    
+    # Index command
+    index_parser = subparsers.add_parser("index", help="Build or query the local city index")
+    index_subparsers = index_parser.add_subparsers(dest="action", required=True)
+    index_build = index_subparsers.add_parser("build", help="Build from a bulk city list")
+    index_build.add_argument("source", type=Path, help="city.list.json or city.list.json.gz")
+    index_lookup = index_subparsers.add_parser("lookup", help="Look up a city name")
+    index_lookup.add_argument("name", help='City name, optionally "Name,CC"')
+    index_parser.set_defaults(func=cmd_index)
+    
     # Parse and execute
     args = parser.parse_args()
     
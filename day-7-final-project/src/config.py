@@ -2,34 +2,108 @@
 
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def quota_from_env(name: str, default: Optional[int]) -> Optional[int]:
+    """Read a quota cap from the environment; 0 means no cap"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return int(value) or None
+
 @dataclass
 class PipelineConfig:
     """Pipeline configuration"""
     
     # API
     api_key: str = field(default_factory=lambda: os.getenv("OPENWEATHER_API_KEY", ""))
+    # Extra keys to pool with api_key (OPENWEATHER_API_KEYS, comma-separated).
+    # Each gets its own rate limit; a key answered with 429 is paused for
+    # key_cooldown and one answered with 401 set aside for key_suspend_seconds
+    api_keys: List[str] = field(
+        default_factory=lambda: [key.strip() for key in os.getenv("OPENWEATHER_API_KEYS", "").split(",") if key.strip()]
+    )
+    key_cooldown: float = 10.0
+    key_suspend_seconds: float = 600.0
     api_base_url: str = "https://api.openweathermap.org/data/2.5/weather"
-    api_timeout: int = 10
+    api_group_url: str = "https://api.openweathermap.org/data/2.5/group"
+    connect_timeout: float = 5.0
+    read_timeout: float = 10.0
+    deadline: Optional[float] = None  # Seconds a fetch run may take in total
     
-    # Rate limiting
+    # Rate limiting (token bucket: sustained rate plus burst allowance)
     calls_per_second: float = 1.0
+    rate_limit_burst: int = 1
+    
+    # Adaptive (AIMD) rate control between these bounds; 429/5xx responses
+    # are requeued up to max_requeues times either way
+    adaptive_rate: bool = False
+    min_calls_per_second: float = 0.1
+    max_calls_per_second: float = 10.0
+    max_requeues: int = 3
+    rate_limit_file: Optional[Path] = field(
+        default_factory=lambda: Path(os.environ["RATE_LIMIT_FILE"]) if os.getenv("RATE_LIMIT_FILE") else None
+    )
+    
+    # Provider call caps per key (None for no cap). Calls are counted in a
+    # ledger at quota_path across runs. The per-minute cap is opt-in since
+    # it also caps the rate (the free tier's is 60)
+    quota_per_minute: Optional[int] = field(default_factory=lambda: quota_from_env("QUOTA_PER_MINUTE", None))
+    quota_per_day: Optional[int] = field(default_factory=lambda: quota_from_env("QUOTA_PER_DAY", None))
+    quota_per_month: Optional[int] = field(default_factory=lambda: quota_from_env("QUOTA_PER_MONTH", 1_000_000))
+    track_quota: bool = True
+    quota_path: Path = field(default=None)
+    
+    # Concurrency ("sync" uses `workers` threads, "async" uses asyncio)
+    engine: str = "sync"
+    max_concurrency: int = 10
+    workers: int = 1
+    batch_size: int = 0  # >1 batches known city IDs via the group endpoint (max 20)
+    
+    # Hedged requests: a single-city request still unanswered after this
+    # percentile of recent latencies gets a duplicate, and the first answer
+    # wins. Hedges are capped at hedge_budget of requests (None: no hedging)
+    hedge_percentile: Optional[float] = None
+    hedge_budget: float = 0.05
+    
+    # HTTP connection pooling (keep_alive_timeout only applies to async)
+    pool_size: int = 10
+    pool_per_host: int = 10
+    keep_alive: bool = True
+    keep_alive_timeout: float = 15.0
     
     # Retry
     max_retries: int = 3
     base_delay: float = 1.0
     max_delay: float = 30.0
+    retry_budget: float = 0.2  # Retries allowed as a fraction of calls made (429/5xx requeues exempt)
+    
+    # Circuit breaker (fail fast during provider outages)
+    breaker_failure_threshold: int = 5
+    breaker_recovery_timeout: float = 30.0
+    breaker_success_threshold: int = 2
+    
+    # Response cache (OpenWeather refreshes current conditions ~every 10 min)
+    cache_enabled: bool = True
+    cache_ttl: int = 600
+    cache_max_entries: int = 10000
+    negative_cache_ttl: int = 7 * 24 * 3600  # Cities that returned 404
+    cache_path: Path = field(default=None)
+    
+    # Local city index (built with `cli index build`), used if present
+    use_city_index: bool = True
+    city_index_path: Path = field(default=None)
     
     # Paths
     base_dir: Path = field(default_factory=lambda: Path(__file__).parent.parent)
     output_dir: Path = field(default=None)
     log_dir: Path = field(default=None)
     data_dir: Path = field(default=None)
+    runs_dir: Path = field(default=None)  # Run journals for --resume
     
     # Logging
     log_level: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
@@ -42,14 +116,29 @@ class PipelineConfig:
             self.log_dir = self.base_dir / "logs"
         if self.data_dir is None:
             self.data_dir = self.base_dir / "data"
+        if self.runs_dir is None:
+            self.runs_dir = self.base_dir / "runs"
+        if self.city_index_path is None:
+            self.city_index_path = self.data_dir / "city_index.db"
+        if self.cache_path is None:
+            self.cache_path = self.base_dir / "cache" / "weather.db"
+        if self.quota_path is None:
+            self.quota_path = self.base_dir / "cache" / "quota.db"
         
         # Create directories
         for dir_path in [self.output_dir, self.log_dir, self.data_dir]:
             dir_path.mkdir(parents=True, exist_ok=True)
     
+    def all_api_keys(self) -> List[str]:
+        """api_key followed by any pooled keys, without duplicates"""
+        return list(dict.fromkeys(key for key in [self.api_key, *self.api_keys] if key))
+    
+    def quota_limits(self) -> Dict[str, Optional[int]]:
+        return {"minute": self.quota_per_minute, "day": self.quota_per_day, "month": self.quota_per_month}
+    
     def validate(self) -> bool:
         """Validate configuration"""
-        if not self.api_key:
+        if not self.all_api_keys():
             return False
         return True
 
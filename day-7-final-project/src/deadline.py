@@ -0,0 +1,47 @@
+"""Run-level time budget"""
+
+import time
+from typing import Tuple
+
+class DeadlineExceeded(Exception):
+    """The run's deadline passed before a request could be made"""
+
+class Deadline:
+    """A point in time a run must be finished by
+    
+    Requests check it before going out and have their timeouts shrunk so
+    they end by it; the scheduler stops starting new cities once it is
+    closed: passed, or booked up by the rate limiter.
+    """
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.full = False
+    
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+    
+    def closed(self) -> bool:
+        """True once no new request can be sent in time"""
+        return self.full or self.expired()
+    
+    def check(self, wait: float = 0.0):
+        """Raise DeadlineExceeded if the deadline has passed, or would during `wait`
+        
+        Only the caller whose wait crosses the deadline fails; callers
+        already holding earlier tokens still send. New callers would queue
+        behind it, though, so the deadline is marked full and no more
+        cities are started.
+        """
+        if time.monotonic() + wait >= self.expires_at:
+            self.full = self.full or wait > 0
+            raise DeadlineExceeded(f"run deadline of {self.seconds:.0f}s reached")
+    
+    def timeouts(self, connect: float, read: float) -> Tuple[float, float]:
+        """Connect and read timeouts cut down to the time remaining"""
+        left = self.remaining()
+        return min(connect, left), min(read, left)
@@ -0,0 +1,106 @@
+"""Typed decoding of OpenWeatherMap responses
+
+With msgspec installed, response bytes are decoded against a schema of
+just the fields WeatherData needs, in one pass: unused fields are skipped
+without building dicts for them, and a payload of the wrong shape fails
+with the path of the offending field. Without it, the stdlib json module
+and plain dict lookups are used.
+"""
+
+import json
+from typing import Callable, List, Tuple, TypeVar, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+T = TypeVar("T")
+
+Body = Union[bytes, bytearray, memoryview, str]
+
+class PayloadError(ValueError):
+    """An API response that doesn't have the expected shape"""
+
+if msgspec is not None:
+    from typing import Annotated
+    
+    class _Sys(msgspec.Struct, gc=False):
+        country: str
+    
+    class _Main(msgspec.Struct, gc=False):
+        temp: float
+        humidity: int
+    
+    class _Condition(msgspec.Struct, gc=False):
+        description: str
+    
+    class _Wind(msgspec.Struct, gc=False):
+        speed: float
+    
+    class _Current(msgspec.Struct, gc=False):
+        name: str
+        sys: _Sys
+        main: _Main
+        weather: Annotated[List[_Condition], msgspec.Meta(min_length=1)]
+        wind: _Wind
+        id: int = 0
+    
+    class _Group(msgspec.Struct, gc=False):
+        # Items stay raw bytes so each can be cached exactly as received
+        list: List[msgspec.Raw] = []
+    
+    _current_decoder = msgspec.json.Decoder(_Current)
+    _group_decoder = msgspec.json.Decoder(_Group)
+
+def decode_weather(body: Body, record: Callable[..., T], **extra) -> Tuple[T, int]:
+    """Decode a current weather payload into (record, city ID)
+    
+    `record` is called with WeatherData's fields plus `extra`. Raises
+    PayloadError if the body isn't JSON or lacks a needed field.
+    """
+    if msgspec is None:
+        return _decode_weather_json(body, record, **extra)
+    
+    try:
+        data = _current_decoder.decode(body)
+    except msgspec.DecodeError as e:
+        raise PayloadError(f"malformed weather payload: {e}") from None
+    
+    return record(
+        city=data.name,
+        country=data.sys.country,
+        temp_celsius=data.main.temp,
+        humidity=data.main.humidity,
+        description=data.weather[0].description,
+        wind_speed=data.wind.speed,
+        **extra
+    ), data.id
+
+def decode_group(body: Body) -> List[Body]:
+    """Split a group endpoint response into the raw JSON of each city"""
+    if msgspec is None:
+        try:
+            return [json.dumps(item) for item in json.loads(body).get("list", [])]
+        except (ValueError, AttributeError) as e:
+            raise PayloadError(f"malformed group payload: {e}") from None
+    
+    try:
+        return _group_decoder.decode(body).list
+    except msgspec.DecodeError as e:
+        raise PayloadError(f"malformed group payload: {e}") from None
+
+def _decode_weather_json(body: Body, record: Callable[..., T], **extra) -> Tuple[T, int]:
+    try:
+        data = json.loads(body)
+        return record(
+            city=data["name"],
+            country=data["sys"]["country"],
+            temp_celsius=data["main"]["temp"],
+            humidity=data["main"]["humidity"],
+            description=data["weather"][0]["description"],
+            wind_speed=data["wind"]["speed"],
+            **extra
+        ), data.get("id", 0)
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise PayloadError(f"malformed weather payload: {type(e).__name__}: {e}") from None
@@ -2,20 +2,184 @@
 
 import json
 import csv
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import fields
 from os import path
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Run metadata for formats that can't embed it sits next to the data file
+METADATA_SUFFIX = ".meta.json"
+
+def metadata_path(path: Path) -> Path:
+    """Sidecar metadata file for a data file ("weather.csv" -> "weather.csv.meta.json")"""
+    path = Path(path)
+    return path.with_name(path.name + METADATA_SUFFIX)
+
+ARROW_TYPES = {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+
+def arrow_schema(record_type, **types) -> pa.Schema:
+    """Arrow schema for a flat dataclass such as WeatherData
+    
+    `types` overrides the Python type of named fields, for fields that
+    to_dict() writes differently (e.g. fetched_at=str).
+    """
+    return pa.schema([(f.name, ARROW_TYPES[types.get(f.name, f.type)]) for f in fields(record_type)])
+
+def cast_record(record: Dict[str, Any], record_type, **types) -> Dict[str, Any]:
+    """Convert string values (e.g. read from CSV) to the types of `record_type`'s fields
+    
+    `types` overrides field types as for arrow_schema(). Empty strings
+    become None; values that aren't strings are left alone.
+    """
+    casts = {f.name: types.get(f.name, f.type) for f in fields(record_type)}
+    typed = {}
+    for name, value in record.items():
+        cast = casts.get(name, str)
+        if isinstance(value, str) and cast is not str:
+            if not value:
+                value = None
+            elif cast is bool:
+                value = value.strip().lower() in ("true", "1")
+            else:
+                value = cast(value)
+        typed[name] = value
+    return typed
+
+class RecordSink(ABC):
+    """Incremental writer: append records as they arrive, then close
+    
+    The file is created on the first write and flushed after every write,
+    so other processes can follow it while a run is in progress. Safe to
+    share between threads. Subclasses implement _write for their format.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._opened = False
+    
+    def __enter__(self) -> "RecordSink":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def write(self, record: Dict[str, Any]):
+        self.write_many([record])
+    
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            if not self._opened:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._open(records[0])
+                self._opened = True
+            self._write(records)
+            self.count += len(records)
+    
+    def close(self):
+        with self._lock:
+            if not self._opened:
+                return
+            self._close()
+            self._opened = False
+        logger.info(f"Wrote {self.count} records to {self.path}")
+    
+    def _open(self, first: Dict[str, Any]):
+        self._file = open(self.path, "w", newline="")
+    
+    @abstractmethod
+    def _write(self, records: List[Dict]):
+        """Append records to the open file (called under the lock)"""
+    
+    def _close(self):
+        self._file.close()
+
+class JsonlSink(RecordSink):
+    def _write(self, records: List[Dict]):
+        self._file.writelines(json.dumps(record) + "\n" for record in records)
+        self._file.flush()
+
+class CsvSink(RecordSink):
+    def _open(self, first: Dict[str, Any]):
+        super()._open(first)
+        self._writer = csv.DictWriter(self._file, fieldnames=first.keys())
+        self._writer.writeheader()
+    
+    def _write(self, records: List[Dict]):
+        self._writer.writerows(records)
+        self._file.flush()
+
+class ParquetSink(RecordSink):
+    """Buffers rows into row groups of `row_group_size`
+    
+    Parquet is only readable once closed (the footer comes last). Pass a
+    schema to pin column types; otherwise it is inferred from the first
+    row group.
+    """
+    
+    def __init__(self, path: Path, schema: Optional[pa.Schema] = None, row_group_size: int = 1000):
+        super().__init__(path)
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self._rows: List[Dict] = []
+        self._writer: Optional[pq.ParquetWriter] = None
+    
+    def _open(self, first: Dict[str, Any]):
+        pass
+    
+    def _write(self, records: List[Dict]):
+        self._rows.extend(records)
+        if len(self._rows) >= self.row_group_size:
+            self._flush_rows()
+    
+    def _flush_rows(self):
+        table = pa.Table.from_pylist(self._rows, schema=self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(table)
+        self._rows = []
+    
+    def _close(self):
+        if self._rows:
+            self._flush_rows()
+        self._writer.close()
+
 class DataWriter:
     """Write data to various formats"""
     
     SUPPORTED_FORMATS = ["json", "csv", "parquet", "jsonl"]
+    SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "parquet": ParquetSink}
+    
+    @staticmethod
+    def open(path: Path, format: str = None, schema: Optional[pa.Schema] = None) -> RecordSink:
+        """Open an incremental sink (jsonl, csv or parquet)"""
+        path = Path(path)
+        format = format or path.suffix.lstrip(".")
+        
+        if format not in DataWriter.SINKS:
+            raise ValueError(f"Streaming not supported for format: {format}")
+        
+        if format == "parquet":
+            return ParquetSink(path, schema)
+        return DataWriter.SINKS[format](path)
+    
+    @staticmethod
+    def write_metadata(path: Path, metadata: Dict[str, Any]):
+        """Write run metadata to the sidecar file for a data file"""
+        metadata_path(path).write_text(json.dumps(metadata, indent=2))
     
     @staticmethod
     def write(data: List[Dict[str, Any]], path: Path, format: str = None):
@@ -79,6 +243,46 @@ class DataReader:
         logger.info(f"Read {len(data)} records from {path}")
         return data
     
+    @staticmethod
+    def iter(path: Path, format: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream records from a file
+        
+        JSON Lines, CSV and Parquet (one row group at a time) are read
+        lazily; a JSON document has to be parsed whole.
+        """
+        path = Path(path)
+        format = format or path.suffix.lstrip(".")
+        
+        if format not in DataReader.SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+        
+        if format == "jsonl":
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        elif format == "csv":
+            with open(path, newline="") as f:
+                yield from csv.DictReader(f)
+        elif format == "parquet":
+            for batch in pq.ParquetFile(path).iter_batches():
+                yield from batch.to_pylist()
+        else:
+            yield from DataReader._read_json(path)
+    
+    @staticmethod
+    def read_metadata(path: Path) -> Optional[Dict[str, Any]]:
+        """Run metadata embedded in a JSON output or stored in its sidecar"""
+        path = Path(path)
+        sidecar = metadata_path(path)
+        if sidecar.exists():
+            return json.loads(sidecar.read_text())
+        if path.suffix == ".json":
+            data = json.loads(path.read_text())
+            if isinstance(data, dict):
+                return data.get("metadata")
+        return None
+    
     @staticmethod
     def _read_json(path: Path) -> List[Dict]:
         data = json.loads(path.read_text())
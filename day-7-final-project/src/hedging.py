@@ -0,0 +1,52 @@
+"""Hedged requests: a backup call for requests slower than usual"""
+
+import math
+import threading
+from collections import deque
+from typing import Optional
+
+class HedgePolicy:
+    """Decides when a slow request gets a duplicate (thread-safe)
+    
+    The hedge delay is the `percentile` of the last `window` request
+    latencies, so only the slowest few percent of requests are hedged.
+    Nothing is hedged until `min_samples` latencies are known, and hedges
+    are capped at `budget` (a fraction) of the requests made.
+    """
+    
+    def __init__(self, percentile: float, budget: float = 0.05, window: int = 500, min_samples: int = 20):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        """Record how long a request took to answer"""
+        with self._lock:
+            self._latencies.append(seconds)
+    
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a new request (None: don't hedge)"""
+        with self._lock:
+            self.requests += 1
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        rank = math.ceil(self.percentile / 100 * len(latencies)) - 1
+        return latencies[min(max(rank, 0), len(latencies) - 1)]
+    
+    def try_hedge(self) -> bool:
+        """Claim one hedge if the budget allows it"""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+    
+    def release(self):
+        """Give back a hedge claimed with try_hedge() but not sent"""
+        with self._lock:
+            self.hedges -= 1
@@ -0,0 +1,124 @@
+"""Append-only run journal for resumable fetch runs"""
+
+import json
+import os
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .api import WeatherData
+
+logger = logging.getLogger(__name__)
+
+class RunJournal:
+    """JSON Lines record of the cities a fetch run has completed
+    
+    The first line names the run's input sources. Cities are appended as
+    they are read from the input, and again with their result as soon as
+    they succeed, each line flushed, so a killed run can be resumed by
+    fetching only what's missing. A torn last line left by a crash is
+    ignored when the journal is read back. Journals of runs that complete
+    cleanly are deleted.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.run_id = self.path.stem
+        self._lock = threading.Lock()
+        self._file = None
+    
+    @classmethod
+    def create(
+        cls,
+        runs_dir: Path,
+        sources: List[str] = None,
+        shard: Tuple[int, int] = None
+    ) -> "RunJournal":
+        """Start a journal for a new run reading the given cities files"""
+        runs_dir = Path(runs_dir)
+        runs_dir.mkdir(parents=True, exist_ok=True)
+        run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        
+        journal = cls(runs_dir / f"{run_id}.jsonl")
+        journal._file = journal.path.open("x", encoding="utf-8")
+        journal._write({"run_id": run_id, "started_at": datetime.now().isoformat(), "sources": sources or [], "shard": shard})
+        return journal
+    
+    @classmethod
+    def open(cls, runs_dir: Path, run_id: str) -> "RunJournal":
+        """Reopen an earlier run's journal to resume it"""
+        path = Path(runs_dir) / f"{run_id}.jsonl"
+        if not path.exists():
+            raise FileNotFoundError(f"No journal for run {run_id} in {runs_dir}")
+        
+        journal = cls(path)
+        with path.open("rb+") as f:
+            # Drop a torn final line so new entries start on their own line
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+        journal._file = path.open("a", encoding="utf-8")
+        return journal
+    
+    def header(self) -> Dict:
+        with self.path.open(encoding="utf-8") as f:
+            return json.loads(f.readline())
+    
+    def sources(self) -> List[str]:
+        """The cities files the run was started with"""
+        return self.header()["sources"]
+    
+    def shard(self) -> Optional[Tuple[int, int]]:
+        """The (shard, shards) the run was limited to, if any"""
+        shard = self.header().get("shard")
+        return tuple(shard) if shard else None
+    
+    def _entries(self) -> Iterator[Dict]:
+        with self.path.open(encoding="utf-8") as f:
+            next(f, None)  # Header
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring torn journal entry in {self.path}")
+    
+    def inputs(self) -> List[str]:
+        """Cities read from the input so far, in order"""
+        return [entry["city"] for entry in self._entries() if "weather" not in entry]
+    
+    def completed(self) -> Dict[str, WeatherData]:
+        """Results already recorded, by city"""
+        return {
+            entry["city"]: WeatherData.from_dict(entry["weather"])
+            for entry in self._entries()
+            if "weather" in entry
+        }
+    
+    def track(self, cities: Iterable[str]) -> Iterator[str]:
+        """Pass cities through, recording each one as it is read"""
+        for city in cities:
+            self._write({"city": city})
+            yield city
+    
+    def record(self, city: str, weather: Optional[WeatherData]):
+        """Append a successful city (failures are left to be retried on resume)"""
+        if weather is not None:
+            self._write({"city": city, "weather": weather.to_dict()})
+    
+    def _write(self, entry: Dict):
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+    
+    def delete(self):
+        """Close and remove the journal once there is nothing left to resume"""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,25 +1,78 @@
 """Main pipeline orchestration"""
 
+import asyncio
+import itertools
 import logging
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Dict, Any, Sized, Tuple
 from pathlib import Path
 from datetime import datetime
 from dataclasses import dataclass, field
 
 from .config import PipelineConfig
-from .api import WeatherAPIClient, WeatherData
-from .formats import DataWriter
+from .api import UNITS, RetryLater, WeatherAPIClient, WeatherData
+from .batch import WeatherBatch
+from .formats import DataWriter, RecordSink
+from .deadline import Deadline
+from .journal import RunJournal
+from .quota import QuotaExhausted
+from .scheduler import FetchScheduler, FetchTask
+from .singleflight import AsyncSingleFlight
+from .sources import city_key, iter_cities, unique_cities
 
 logger = logging.getLogger(__name__)
 
+# Batched runs read this many groups' worth of cities at a time
+BATCH_CHUNK_GROUPS = 50
+
+# Largest run (in calls) whose input is read up front to fit it into the quota
+QUOTA_PLAN_LIMIT = 100_000
+
 @dataclass
 class PipelineStats:
     """Track pipeline execution statistics"""
     total: int = 0
     success: int = 0
     failed: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+    throttled_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    not_found_skipped: int = 0
+    group_requests: int = 0
+    batched_cities: int = 0
+    short_circuited: int = 0
+    throttled_responses: int = 0
+    requeued: int = 0
+    retried: int = 0
+    retries_denied: int = 0
+    resumed: int = 0
+    keys_suspended: int = 0
+    deferred: int = 0
+    hedges_fired: int = 0
+    hedges_won: int = 0
+    deadline_exceeded: int = 0
+    coalesced: int = 0
     start_time: datetime = field(default_factory=datetime.now)
     end_time: Optional[datetime] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    
+    def record_counters(self, before: Dict[str, float], after: Dict[str, float]):
+        """Add client counters accumulated during this run"""
+        for key, value in after.items():
+            setattr(self, key, getattr(self, key, 0) + value - before.get(key, 0))
+    
+    def record(self, success: bool):
+        """Count one finished city (safe to call from worker threads)"""
+        with self._lock:
+            if success:
+                self.success += 1
+            else:
+                self.failed += 1
     
     @property
     def duration_seconds(self) -> float:
@@ -30,63 +83,543 @@ class PipelineStats:
     def success_rate(self) -> float:
         return (self.success / self.total * 100) if self.total > 0 else 0
     
+    @staticmethod
+    def combine(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine to_dict() outputs of runs made side by side, e.g. shards"""
+        combined: Dict[str, float] = {}
+        for entry in stats:
+            for key, value in entry.items():
+                value = float(str(value).rstrip("%"))
+                if key == "duration_seconds":
+                    combined[key] = max(combined.get(key, 0.0), value)
+                elif key != "success_rate":
+                    combined[key] = combined.get(key, 0) + value
+        
+        result: Dict[str, Any] = {
+            key: f"{value:.2f}" if key in ("throttled_seconds", "duration_seconds") else int(value)
+            for key, value in combined.items()
+        }
+        total = result.get("total", 0)
+        result["success_rate"] = f"{(result.get('success', 0) / total * 100) if total else 0:.1f}%"
+        return result
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "total": self.total,
             "success": self.success,
             "failed": self.failed,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "throttled_seconds": f"{self.throttled_seconds:.2f}",
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "not_found_skipped": self.not_found_skipped,
+            "group_requests": self.group_requests,
+            "batched_cities": self.batched_cities,
+            "short_circuited": self.short_circuited,
+            "throttled_responses": self.throttled_responses,
+            "requeued": self.requeued,
+            "retried": self.retried,
+            "retries_denied": self.retries_denied,
+            "resumed": self.resumed,
+            "keys_suspended": self.keys_suspended,
+            "deferred": self.deferred,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "deadline_exceeded": self.deadline_exceeded,
+            "coalesced": self.coalesced,
             "success_rate": f"{self.success_rate:.1f}%",
             "duration_seconds": f"{self.duration_seconds:.2f}"
         }
 
+@dataclass
+class PipelineRun:
+    """State of one fetch run; concurrent runs on a pipeline each have their own"""
+    stats: PipelineStats
+    deadline: Optional[Deadline] = None
+    journal: Optional[RunJournal] = None
+    sink: Optional[RecordSink] = None
+    
+    @property
+    def deadline_reached(self) -> bool:
+        return self.deadline is not None and self.deadline.closed()
+
 class WeatherPipeline:
-    """Main weather data pipeline"""
+    """Main weather data pipeline
+    
+    `stats` and `deadline` belong to the most recently started run; pass
+    your own PipelineStats to iter_weather/aiter_weather to follow one of
+    several concurrent runs.
+    """
     
     def __init__(self, config: PipelineConfig = None):
         self.config = config or PipelineConfig()
         self.client = WeatherAPIClient(self.config)
+        # Outlives async runs so concurrent ones coalesce fetches of a city
+        self._async_flights = AsyncSingleFlight()
         self.stats = PipelineStats()
+        self.deadline: Optional[Deadline] = None
+    
+    def city_source(self, *sources: str, exclude: Iterable[str] = ()) -> Iterator[str]:
+        """Stream de-duplicated cities from files, globs or "-" (stdin)
+        
+        When a city index is present, names it doesn't know are dropped as
+        they are read, before any request is made.
+        """
+        cities = iter_cities(sources, exclude=exclude)
+        if self.client.city_index:
+            cities = self._known_cities(cities)
+        return cities
     
     def load_cities_from_file(self, path: Path) -> List[str]:
         """Load city list from file"""
-        path = Path(path)
-        if not path.exists():
-            raise FileNotFoundError(f"Cities file not found: {path}")
+        return list(self.city_source(path))
+    
+    def resolve_cities(self, cities: List[str]) -> List[str]:
+        """Drop cities the local index doesn't know, before any request is made"""
+        return list(self._known_cities(cities))
+    
+    def _known_cities(self, cities: Iterable[str]) -> Iterator[str]:
+        known = total = 0
         
-        cities = [
-            line.strip()
-            for line in path.read_text().strip().split("\n")
-            if line.strip() and not line.startswith("#")
-        ]
+        for city in cities:
+            total += 1
+            matches = self.client.city_index.lookup(city)
+            if not matches:
+                logger.warning(f"✗ {city}: not in city index, skipping")
+                continue
+            if len(matches) > 1:
+                logger.debug(
+                    f"{city}: {len(matches)} matches in city index, "
+                    f"qualify as '{city},<country>' to query by ID"
+                )
+            known += 1
+            yield city
         
-        logger.info(f"Loaded {len(cities)} cities from {path}")
-        return cities
+        logger.info(f"Resolved {known}/{total} cities against the city index")
     
-    def fetch_weather(self, cities: List[str]) -> List[WeatherData]:
-        """Fetch weather for multiple cities"""
-        logger.info(f"Starting pipeline for {len(cities)} cities")
+    def fetch_weather(
+        self,
+        cities: Iterable[str],
+        journal: RunJournal = None,
+        sink: RecordSink = None
+    ) -> List[WeatherData]:
+        """Fetch weather for multiple cities
         
-        self.stats = PipelineStats()
-        self.stats.total = len(cities)
+        Cities may be any iterable, e.g. a streaming city_source(); it is
+        consumed as fetching proceeds. With a journal, each finished city is
+        recorded as it completes and cities it already holds (from an
+        interrupted run) are not refetched. With a sink, records are written
+        in completion order as they arrive instead of being collected, and
+        an empty list is returned.
+        """
+        logger.info(f"Starting pipeline for {len(cities) if isinstance(cities, Sized) else 'streamed'} cities")
+        run = self._start_run(journal=journal, sink=sink)
         
-        results = []
+        done = journal.completed() if journal else {}
+        if done:
+            logger.info(f"Resuming run {journal.run_id}: {len(done)} cities already fetched")
+        order: List[str] = []
         
-        for city in cities:
-            weather = self.client.fetch(city)
-            if weather:
-                results.append(weather)
-                self.stats.success += 1
-            else:
-                self.stats.failed += 1
+        def remaining() -> Iterator[str]:
+            for city in cities:
+                if not sink:
+                    order.append(city)
+                if city in done:
+                    run.stats.total += 1
+                    run.stats.resumed += 1
+                    run.stats.record(True)
+                    if sink:
+                        sink.write(done[city].to_dict())
+                    continue
+                yield city
         
-        self.stats.end_time = datetime.now()
+        fetched = self._fetch_all(self._within_quota(remaining(), run), run)
+        fetched.update(done)
+        results = [fetched[city] for city in order if city in fetched]
         
+        self._finish_run(run)
+        return results
+    
+    def fetch_lists(self, paths: List[Path]) -> Dict[Path, List[WeatherData]]:
+        """Fetch several city lists, requesting cities they share only once
+        
+        Returns each list's results in that list's order.
+        """
+        lists = {Path(path): list(self.city_source(path)) for path in paths}
+        unique = list(unique_cities(itertools.chain.from_iterable(lists.values())))
         logger.info(
-            f"Pipeline complete: {self.stats.success}/{self.stats.total} "
-            f"({self.stats.success_rate:.1f}%) in {self.stats.duration_seconds:.2f}s"
+            f"Starting pipeline for {len(lists)} lists: "
+            f"{sum(map(len, lists.values()))} cities, {len(unique)} unique"
         )
         
-        return results
+        run = self._start_run()
+        fetched = {
+            city_key(city): weather
+            for city, weather in self._fetch_all(self._within_quota(unique, run), run).items()
+        }
+        self._finish_run(run)
+        
+        return {
+            path: [fetched[city_key(city)] for city in cities if city_key(city) in fetched]
+            for path, cities in lists.items()
+        }
+    
+    def iter_weather(self, cities: Iterable[str], stats: PipelineStats = None) -> Iterator[WeatherData]:
+        """Yield weather for each city as soon as it completes
+        
+        Accepts any iterable of cities, including an unbounded one, and
+        only reads ahead as far as there are free workers. Results arrive
+        in completion order, failed cities are skipped, and `stats` (the
+        run's own if given, else the pipeline's) is kept current as cities
+        finish. Runs on worker threads; use aiter_weather from async code.
+        """
+        run = self._start_run(stats)
+        try:
+            for _, weather in self._iter_fetch(cities, run):
+                if weather:
+                    yield weather
+        finally:
+            self._finish_run(run)
+    
+    async def aiter_weather(self, cities: Iterable[str], stats: PipelineStats = None) -> AsyncIterator[WeatherData]:
+        """Async version of iter_weather, fetching with asyncio"""
+        run = self._start_run(stats)
+        try:
+            async for _, weather in self._aiter_fetch(cities, run):
+                if weather:
+                    yield weather
+        finally:
+            self._finish_run(run)
+    
+    def fetch_batch(self, cities: Iterable[str]) -> WeatherBatch:
+        """Fetch into a columnar WeatherBatch, in completion order, on the configured engine
+        
+        Each result is appended as it arrives, so only the batch's columns
+        are held rather than one WeatherData per city.
+        """
+        batch = WeatherBatch()
+        if self.config.engine == "async":
+            async def collect():
+                async for weather in self.aiter_weather(cities):
+                    batch.append(weather)
+            asyncio.run(collect())
+        else:
+            batch.extend(self.iter_weather(cities))
+        return batch
+    
+    def _start_run(
+        self,
+        stats: PipelineStats = None,
+        journal: RunJournal = None,
+        sink: RecordSink = None
+    ) -> PipelineRun:
+        run = PipelineRun(
+            stats or PipelineStats(),
+            Deadline(self.config.deadline) if self.config.deadline else None,
+            journal,
+            sink
+        )
+        self.stats, self.deadline = run.stats, run.deadline
+        if run.deadline:
+            logger.info(f"Deadline: {run.deadline.seconds:.0f}s")
+        return run
+    
+    @property
+    def deadline_reached(self) -> bool:
+        return self.deadline is not None and self.deadline.closed()
+    
+    def _finish_run(self, run: PipelineRun):
+        stats = run.stats
+        stats.end_time = datetime.now()
+        if run.deadline_reached:
+            logger.warning(f"Stopped at the {run.deadline.seconds:.0f}s deadline; results are partial")
+        
+        logger.info(
+            f"Pipeline complete: {stats.success}/{stats.total} "
+            f"({stats.success_rate:.1f}%) in {stats.duration_seconds:.2f}s"
+        )
+    
+    def _run_client(self, run: PipelineRun) -> WeatherAPIClient:
+        """A sync client for one run: its own deadline and counters, the pipeline's connections and state"""
+        client = WeatherAPIClient(self.config, shared=self.client)
+        client.deadline = run.deadline
+        return client
+    
+    def _within_quota(self, cities: Iterable[str], run: PipelineRun) -> Iterable[str]:
+        """Fit a run into the calls left on the API keys' daily/monthly quota
+        
+        If the cities need more calls than remain, those cached within the
+        TTL (which cost nothing) are kept and the rest are fetched stalest
+        first, never-fetched cities leading; the remainder is deferred. Only
+        inputs of up to QUOTA_PLAN_LIMIT cities are planned, so large or
+        endless streamed inputs aren't held in memory. Any run stops
+        fetching if the quota runs out anyway, deferring what's left (see
+        _defer).
+        """
+        left = self.client.keys.calls_left()
+        if left is None:
+            return cities
+        
+        capacity = left * max(self.config.batch_size, 1)
+        if capacity > QUOTA_PLAN_LIMIT:
+            return cities
+        
+        logger.info(f"Quota: {left} calls left today/this month")
+        cities = iter(cities)
+        planned = list(islice(cities, capacity + 1))
+        if len(planned) <= capacity:
+            return planned
+        planned.extend(islice(cities, QUOTA_PLAN_LIMIT + 1 - len(planned)))
+        if len(planned) > QUOTA_PLAN_LIMIT:
+            logger.warning(
+                f"Quota allows {left} more calls; over {QUOTA_PLAN_LIMIT} cities to fetch, "
+                f"so the run will stop when it runs out"
+            )
+            return itertools.chain(planned, cities)
+        
+        fetched_at = self.client.cache.fetched_times(planned, UNITS) if self.client.cache else {}
+        cutoff = time.time() - self.config.cache_ttl
+        fresh = [city for city in planned if fetched_at.get(city, 0) > cutoff]
+        stale = sorted(
+            (city for city in planned if fetched_at.get(city, 0) <= cutoff),
+            key=lambda city: fetched_at.get(city, 0)
+        )
+        
+        deferred = max(len(stale) - capacity, 0)
+        run.stats.deferred += deferred
+        logger.warning(
+            f"Quota allows {left} more calls: fetching the {len(stale) - deferred} stalest "
+            f"of {len(stale)} uncached cities, deferring {deferred}"
+        )
+        return fresh + stale[:capacity]
+    
+    def _fetch_all(self, cities: Iterable[str], run: PipelineRun) -> Dict[str, WeatherData]:
+        """Fetch on the configured engine, returning successful results by city"""
+        fetched: Dict[str, WeatherData] = {}
+        if self.config.engine == "async":
+            asyncio.run(self._collect_async(cities, fetched, run))
+        else:
+            for city, weather in self._iter_fetch(cities, run):
+                if weather:
+                    fetched[city] = weather
+        return fetched
+    
+    def _record(self, run: PipelineRun, city: str, weather: Optional[WeatherData]) -> Optional[WeatherData]:
+        """Count, journal and sink a finished city
+        
+        Returns the weather for the caller to keep, or None once it has
+        been handed to the sink.
+        """
+        run.stats.record(weather is not None)
+        if run.journal:
+            run.journal.record(city, weather)
+        if run.sink and weather:
+            run.sink.write(weather.to_dict())
+            return None
+        return weather
+    
+    def _record_counters(self, run: PipelineRun, client, before: Dict[str, float]) -> Dict[str, float]:
+        """Add client counters accumulated since `before`, returning the new baseline"""
+        after = client.counters()
+        run.stats.record_counters(before, after)
+        return after
+    
+    def _iter_fetch(self, cities: Iterable[str], run: PipelineRun) -> Iterator[Tuple[str, Optional[WeatherData]]]:
+        """Yield (city, weather) pairs as they complete on the sync engine"""
+        if self.config.batch_size > 1:
+            return self._iter_batched(cities, run)
+        return self._iter_queued(cities, run)
+    
+    def _iter_queued(self, cities: Iterable[str], run: PipelineRun) -> Iterator[Tuple[str, Optional[WeatherData]]]:
+        """Fetch cities on `workers` threads, yielding results as they complete
+        
+        Each attempt is a single request. Retryable failures are handed to a
+        FetchScheduler, which holds them on a delay queue while the workers
+        keep fetching other cities.
+        """
+        if self.config.workers > 1:
+            logger.info(f"Using {self.config.workers} worker threads")
+        
+        scheduler = FetchScheduler(cities, self.config, run.deadline)
+        pending = {}
+        client = self._run_client(run)
+        before = client.counters()
+        
+        with client, ThreadPoolExecutor(max_workers=self.config.workers) as executor:
+            try:
+                while True:
+                    while len(pending) < self.config.workers:
+                        task = self._next_task(run, scheduler)
+                        if task is None:
+                            break
+                        pending[executor.submit(client.fetch, task.city, True)] = task
+                    
+                    if not pending:
+                        if scheduler.done():
+                            break
+                        time.sleep(scheduler.wait_time() or 0)
+                        continue
+                    
+                    done, _ = wait(pending, timeout=scheduler.wait_time(), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task = pending.pop(future)
+                        before = self._record_counters(run, client, before)
+                        finished, weather = self._settle(run, scheduler, task, future)
+                        if finished:
+                            yield task.city, self._record(run, task.city, weather)
+            finally:
+                # The consumer may stop early; don't start what's still queued
+                for future in pending:
+                    future.cancel()
+    
+    def _next_task(self, run: PipelineRun, scheduler: FetchScheduler) -> Optional[FetchTask]:
+        """Next task to start on either engine, counting cities as they first start"""
+        task = scheduler.next_task()
+        if task is not None and not task.retried:
+            run.stats.total += 1
+        return task
+    
+    def _settle(
+        self,
+        run: PipelineRun,
+        scheduler: FetchScheduler,
+        task: FetchTask,
+        future
+    ) -> Tuple[bool, Optional[WeatherData]]:
+        """Handle a finished attempt on either engine
+        
+        Returns (True, weather) once the city is finished, with None if it
+        failed for good, or (False, None) if it was queued for retry or
+        deferred.
+        """
+        try:
+            return True, future.result()
+        except RetryLater as e:
+            if self._reschedule(run, scheduler, task, e):
+                return False, None
+            return True, None
+        except QuotaExhausted as e:
+            self._defer(run, scheduler, task, e)
+            return False, None
+    
+    def _reschedule(self, run: PipelineRun, scheduler: FetchScheduler, task: FetchTask, error: RetryLater) -> bool:
+        """Queue a retry for a failed task, or log it as failed if it can't be"""
+        reason = scheduler.reschedule(task, error)
+        if reason:
+            logger.error(f"✗ {task.city}: {error} ({reason})")
+            if reason == "retry budget exhausted":
+                run.stats.retries_denied += 1
+            return False
+        
+        if error.throttled:
+            run.stats.requeued += 1
+        else:
+            run.stats.retried += 1
+        return True
+    
+    def _defer(self, run: PipelineRun, scheduler: FetchScheduler, task: FetchTask, error: QuotaExhausted):
+        """Defer a city the quota ran out on; the first one stops the run
+        
+        Deferred cities aren't counted in `total` or journaled as done, so
+        resuming the run fetches them.
+        """
+        undone, unread = [task], 0
+        if not scheduler.stopped:
+            retries, unread = scheduler.stop()
+            undone += retries
+            logger.warning(f"✗ {error}: not starting any more cities; resume the run later for the rest")
+        run.stats.total -= len(undone)
+        run.stats.deferred += len(undone) + (unread or 0)
+    
+    def _iter_batched(self, cities: Iterable[str], run: PipelineRun) -> Iterator[Tuple[str, Optional[WeatherData]]]:
+        """Fetch cities via group requests, a chunk of groups at a time"""
+        chunk_size = self.config.batch_size * BATCH_CHUNK_GROUPS
+        executor = ThreadPoolExecutor(max_workers=self.config.workers) if self.config.workers > 1 else None
+        size = len(cities) if isinstance(cities, Sized) else None
+        read = 0
+        cities = iter(cities)
+        client = self._run_client(run)
+        
+        try:
+            while True:
+                if run.deadline_reached:
+                    logger.warning("Deadline reached, not starting any more cities")
+                    break
+                chunk = list(islice(cities, chunk_size))
+                if not chunk:
+                    break
+                read += len(chunk)
+                
+                run.stats.total += len(chunk)
+                before = client.counters()
+                settled: List[Tuple[str, Optional[WeatherData]]] = []
+                try:
+                    client.fetch_many(
+                        chunk,
+                        executor,
+                        on_result=lambda city, weather: settled.append((city, self._record(run, city, weather)))
+                    )
+                except QuotaExhausted as e:
+                    undone = len(chunk) - len(settled)
+                    run.stats.total -= undone
+                    run.stats.deferred += undone + (size - read if size is not None else 0)
+                    logger.warning(f"✗ {e}: not starting any more cities; resume the run later for the rest")
+                    cities = iter(())
+                finally:
+                    self._record_counters(run, client, before)
+                
+                yield from settled
+        finally:
+            if executor:
+                executor.shutdown()
+            client.close()
+    
+    async def _collect_async(self, cities: Iterable[str], results: Dict[str, WeatherData], run: PipelineRun):
+        async for city, weather in self._aiter_fetch(cities, run):
+            if weather:
+                results[city] = weather
+    
+    async def _aiter_fetch(self, cities: Iterable[str], run: PipelineRun) -> AsyncIterator[Tuple[str, Optional[WeatherData]]]:
+        """Fetch cities with asyncio, yielding (city, weather) as they complete"""
+        # Imported here so the sync engine works without aiohttp installed
+        from .async_api import AsyncWeatherAPIClient
+        
+        scheduler = FetchScheduler(cities, self.config, run.deadline)
+        pending = {}
+        
+        # One session per event loop, but the sync client's key pool, cache
+        # and breaker, so concurrent runs on this pipeline share one rate
+        async with AsyncWeatherAPIClient(self.config, shared=self.client, flights=self._async_flights) as client:
+            client.deadline = run.deadline
+            before = client.counters()
+            
+            try:
+                while True:
+                    while len(pending) < self.config.max_concurrency:
+                        task = self._next_task(run, scheduler)
+                        if task is None:
+                            break
+                        pending[asyncio.ensure_future(client.fetch(task.city, requeue=True))] = task
+                    
+                    if not pending:
+                        if scheduler.done():
+                            break
+                        await asyncio.sleep(scheduler.wait_time() or 0)
+                        continue
+                    
+                    done, _ = await asyncio.wait(
+                        pending, timeout=scheduler.wait_time(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        task = pending.pop(future)
+                        before = self._record_counters(run, client, before)
+                        finished, weather = self._settle(run, scheduler, task, future)
+                        if finished:
+                            yield task.city, self._record(run, task.city, weather)
+            finally:
+                for future in pending:
+                    future.cancel()
     
     def save_results(
         self,
@@ -100,17 +633,23 @@ class WeatherPipeline:
         
         if include_metadata and format in ["json", None]:
             output = {
-                "metadata": {
-                    "generated_at": datetime.now().isoformat(),
-                    "record_count": len(data),
-                    "stats": self.stats.to_dict()
-                },
+                "metadata": self.metadata(len(data)),
                 "data": data
             }
             Path(output_path).write_text(__import__("json").dumps(output, indent=2))
             logger.info(f"Saved results with metadata to {output_path}")
         else:
             DataWriter.write(data, output_path, format)
+            if include_metadata:
+                DataWriter.write_metadata(output_path, self.metadata(len(data)))
+    
+    def metadata(self, record_count: int) -> Dict[str, Any]:
+        """Run metadata stored alongside an output file"""
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "record_count": record_count,
+            "stats": self.stats.to_dict()
+        }
     
     def run(
         self,
@@ -0,0 +1,168 @@
+"""Persistent per-key ledger of API calls against the provider's quotas"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Period name -> UTC bucket format; calls are counted per key per bucket
+PERIODS = {
+    "minute": "%Y-%m-%dT%H:%M",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+class QuotaExhausted(Exception):
+    """Every API key has used up its daily or monthly quota"""
+
+def key_id(key: str) -> str:
+    """Short, stable name for an API key that doesn't reveal it"""
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+class QuotaLedger:
+    """SQLite count of calls made per API key per minute, day and month
+    
+    Shared by every run and process using the same file, so usage carries
+    over between runs. `limits` maps a period to its cap (None for no cap).
+    Minute buckets are pruned after a day, day buckets after ~two months.
+    
+    Usage is cached per key and re-read at most every SYNC_SECONDS, so
+    checking quota before each call stays cheap; calls recorded through
+    this ledger are counted straight away, other processes' a little late.
+    """
+    
+    PRUNE_EVERY = 1000
+    SYNC_SECONDS = 1.0
+    
+    def __init__(self, path: Path, limits: Dict[str, Optional[int]]):
+        self.path = Path(path)
+        self.limits = limits
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            str(self.path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # No fsync per call; WAL stays consistent
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS calls (
+                key_id TEXT NOT NULL,
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                PRIMARY KEY (key_id, period, bucket)
+            ) WITHOUT ROWID
+        """)
+        self._writes = 0
+        # key_id -> (buckets, calls per period, monotonic time read)
+        self._usage: Dict[str, Tuple[Dict[str, str], Dict[str, int], float]] = {}
+    
+    @staticmethod
+    def _buckets(now: datetime = None) -> Dict[str, str]:
+        now = now or datetime.now(timezone.utc)
+        return {period: now.strftime(fmt) for period, fmt in PERIODS.items()}
+    
+    def record(self, key_id: str, calls: int = 1):
+        """Count calls made with a key in the current minute, day and month"""
+        buckets = self._buckets()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    """
+                    INSERT INTO calls VALUES (?, ?, ?, ?)
+                    ON CONFLICT (key_id, period, bucket) DO UPDATE SET calls = calls + excluded.calls
+                    """,
+                    [(key_id, period, bucket, calls) for period, bucket in buckets.items()]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+            
+            cached = self._usage.get(key_id)
+            if cached and cached[0] == buckets:
+                for period in PERIODS:
+                    cached[1][period] += calls
+        
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+    
+    def used(self, key_id: str) -> Dict[str, int]:
+        """Calls made with a key in the current minute, day and month"""
+        buckets = self._buckets()
+        now = time.monotonic()
+        with self._lock:
+            cached = self._usage.get(key_id)
+            if cached and cached[0] == buckets and now - cached[2] < self.SYNC_SECONDS:
+                return dict(cached[1])
+            
+            rows = self.conn.execute(
+                "SELECT period, calls FROM calls WHERE key_id = ? AND (period, bucket) IN (VALUES (?, ?), (?, ?), (?, ?))",
+                (key_id, *(value for item in buckets.items() for value in item))
+            ).fetchall()
+            used = dict.fromkeys(PERIODS, 0)
+            used.update(rows)
+            self._usage[key_id] = (buckets, used, now)
+            return dict(used)
+    
+    def remaining(self, key_id: str, pending: int = 0) -> Dict[str, Optional[int]]:
+        """Calls left in each capped period (None where uncapped)
+        
+        `pending` calls reserved but not yet recorded count as used.
+        """
+        used = self.used(key_id)
+        return {
+            period: None if self.limits.get(period) is None else max(self.limits[period] - used[period] - pending, 0)
+            for period in PERIODS
+        }
+    
+    def exhausted(self, key_id: str, pending: int = 0) -> Optional[str]:
+        """The period whose cap the key has reached, if any (longest first)"""
+        remaining = self.remaining(key_id, pending)
+        for period in reversed(list(PERIODS)):
+            if remaining[period] == 0:
+                return period
+        return None
+    
+    def calls_left(self, key_ids: Iterable[str]) -> Optional[int]:
+        """Calls the keys can still make today and this month (None if uncapped)"""
+        left = None
+        for key in key_ids:
+            remaining = self.remaining(key)
+            caps = [remaining[period] for period in ("day", "month") if remaining[period] is not None]
+            if not caps:
+                return None
+            left = (left or 0) + min(caps)
+        return left
+    
+    @staticmethod
+    def seconds_to_next_minute() -> float:
+        now = datetime.now(timezone.utc)
+        return (now.replace(second=0, microsecond=0) + timedelta(minutes=1) - now).total_seconds()
+    
+    def prune(self) -> int:
+        """Drop buckets too old to count against any cap"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            return sum(
+                self.conn.execute(
+                    "DELETE FROM calls WHERE period = ? AND bucket < ?",
+                    (period, (now - age).strftime(PERIODS[period]))
+                ).rowcount
+                for period, age in (("minute", timedelta(days=1)), ("day", timedelta(days=62)))
+            )
+    
+    def close(self):
+        self.conn.close()
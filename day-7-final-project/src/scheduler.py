@@ -0,0 +1,178 @@
+"""Non-blocking retry scheduling for fetch runs"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sized, Tuple
+
+from .config import PipelineConfig
+from .api import RetryLater
+from .deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with "equal jitter": half fixed, half random"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+@dataclass
+class FetchTask:
+    """One city to fetch, with its retry history"""
+    index: int
+    city: str
+    attempts: int = 0   # Transient failures (timeouts, connection errors)
+    requeues: int = 0   # Throttled responses (429/5xx)
+    
+    @property
+    def retried(self) -> bool:
+        return bool(self.attempts or self.requeues)
+
+class RetryQueue:
+    """Time-ordered queue of tasks waiting out their backoff (thread-safe)"""
+    
+    def __init__(self):
+        self._heap: List[Tuple[float, int, FetchTask]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def push(self, task: FetchTask, delay: float):
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), task))
+    
+    def pop_ready(self) -> Optional[FetchTask]:
+        """Return the earliest task whose backoff has elapsed, if any"""
+        with self._lock:
+            if self._heap and self._heap[0][0] <= time.monotonic():
+                return heapq.heappop(self._heap)[2]
+            return None
+    
+    def drain(self) -> List[FetchTask]:
+        """Remove and return every queued task"""
+        with self._lock:
+            tasks = [task for _, _, task in self._heap]
+            self._heap = []
+            return tasks
+    
+    def next_ready_in(self) -> Optional[float]:
+        """Seconds until the earliest task is due, or None if empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(self._heap[0][0] - time.monotonic(), 0.0)
+
+class RetryBudget:
+    """Caps retries at a fraction of all calls made in a run
+    
+    A small floor lets short runs retry a few times before the ratio
+    has anything to work with.
+    """
+    
+    def __init__(self, ratio: float, floor: int = 10):
+        self.ratio = ratio
+        self.floor = floor
+        self.calls = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+    
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+    
+    def try_spend(self) -> bool:
+        """Claim one retry if the budget allows it"""
+        with self._lock:
+            if self.retries >= self.floor + self.ratio * self.calls:
+                return False
+            self.retries += 1
+            return True
+
+class FetchScheduler:
+    """Hands out cities to fetch: due retries first, then fresh input
+    
+    Failed attempts wait on a RetryQueue instead of sleeping in a worker,
+    so healthy cities keep flowing while others back off. Once the
+    deadline closes no more input is read; retries are only queued if due
+    before it. stop() ends a run early, e.g. once the quota is used up.
+    """
+    
+    def __init__(self, cities: Iterable[str], config: PipelineConfig, deadline: Deadline = None):
+        self.config = config
+        self.deadline = deadline
+        self.retries = RetryQueue()
+        self.budget = RetryBudget(config.retry_budget)
+        self._fresh: Iterator[Tuple[int, str]] = enumerate(cities)
+        self._size = len(cities) if isinstance(cities, Sized) else None
+        self._read = 0
+        self._exhausted = False
+        self.stopped = False
+    
+    def next_task(self) -> Optional[FetchTask]:
+        """Next task to run now, or None if nothing is due"""
+        task = self.retries.pop_ready()
+        if task is None and not self._exhausted:
+            if self.deadline and self.deadline.closed():
+                logger.warning("Deadline reached, not starting any more cities")
+                self._exhausted = True
+                return None
+            item = next(self._fresh, None)
+            if item is None:
+                self._exhausted = True
+            else:
+                self._read += 1
+                task = FetchTask(*item)
+        
+        if task is not None:
+            self.budget.record_call()
+        return task
+    
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next retry is due (None if none are queued)"""
+        return self.retries.next_ready_in()
+    
+    def done(self) -> bool:
+        return self._exhausted and not self.retries
+    
+    def stop(self) -> Tuple[List[FetchTask], Optional[int]]:
+        """Hand out no more tasks
+        
+        Returns the retries that were queued, and how many input cities
+        were never read (None if the input's length isn't known).
+        """
+        self._exhausted = self.stopped = True
+        unread = None if self._size is None else self._size - self._read
+        return self.retries.drain(), unread
+    
+    def reschedule(self, task: FetchTask, error: RetryLater) -> Optional[str]:
+        """Queue a failed task for retry; return why not if it can't be"""
+        if error.throttled:
+            if task.requeues >= self.config.max_requeues:
+                return "too many throttled attempts"
+            delay = error.retry_after or backoff_delay(
+                task.requeues, self.config.base_delay, self.config.max_delay
+            )
+        else:
+            if task.attempts + 1 >= self.config.max_retries:
+                return "retries exhausted"
+            delay = backoff_delay(task.attempts, self.config.base_delay, self.config.max_delay)
+        
+        if self.deadline and delay >= self.deadline.remaining():
+            return "deadline too close"
+        
+        if error.throttled:
+            # Already bounded by max_requeues and the paused rate limiter
+            task.requeues += 1
+        elif not self.budget.try_spend():
+            return "retry budget exhausted"
+        else:
+            task.attempts += 1
+        logger.info(f"↻ {task.city}: {error}, retrying in {delay:.1f}s")
+        self.retries.push(task, delay)
+        return None
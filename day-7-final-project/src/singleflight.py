@@ -0,0 +1,87 @@
+"""Coalescing of concurrent identical calls ("single flight")"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Runs one call per key at a time, sharing it with concurrent callers (threads)
+    
+    The first caller for a key makes the call; callers arriving while it
+    is in flight wait for it and get the same result or exception.
+    """
+    
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: Hashable, call: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines
+    
+    May outlive an event loop and be used from several: calls are only
+    shared between coroutines on the same loop. If the caller making the
+    call is cancelled, a waiting caller takes it over rather than see the
+    cancellation, since it may belong to another run.
+    """
+    
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+    
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        key = (loop, key)
+        future = self._calls.get(key)
+        while future is not None:
+            self.coalesced += 1
+            try:
+                # Shielded so a cancelled follower doesn't cancel the shared call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # The leader was cancelled; the first follower to wake leads next
+            future = self._calls.get(key)
+        
+        future = self._calls[key] = loop.create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved, so a call nobody shared isn't reported as unhandled
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
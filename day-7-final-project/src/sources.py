@@ -0,0 +1,139 @@
+"""Streaming, deduplicating city input"""
+
+import glob
+import hashlib
+import math
+import sys
+import unicodedata
+import logging
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STDIN = "-"
+
+def clean_city(name: str) -> str:
+    """Canonical spelling of a city name: NFKC, single spaces, no padding"""
+    return " ".join(unicodedata.normalize("NFKC", name).split())
+
+def city_key(name: str) -> str:
+    """Key under which two spellings count as the same city ("london" == "London ")"""
+    return clean_city(name).casefold()
+
+def shard_of(city: str, shards: int) -> int:
+    """Shard (1 to `shards`) a city belongs to, stable across runs and machines"""
+    digest = hashlib.blake2b(city_key(city).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards + 1
+
+def in_shard(cities: Iterable[str], shard: int, shards: int) -> Iterator[str]:
+    """Keep only the cities assigned to `shard` of `shards`"""
+    return (city for city in cities if shard_of(city, shards) == shard)
+
+class BloomFilter:
+    """Fixed-size probabilistic set: no false negatives, ~`error_rate` false positives"""
+    
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, key: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+    
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+    
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+class Deduplicator:
+    """Remembers keys seen so far in bounded memory
+    
+    Keys are held exactly until there are `exact_limit` of them, then moved
+    into a Bloom filter sized for `capacity` keys. From then on a new city
+    is occasionally (at about `error_rate`) mistaken for a duplicate.
+    """
+    
+    def __init__(self, exact_limit: int = 100_000, capacity: int = 10_000_000, error_rate: float = 1e-4):
+        self.exact_limit = exact_limit
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._exact: Optional[Set[str]] = set()
+        self._bloom: Optional[BloomFilter] = None
+    
+    def seen(self, key: str) -> bool:
+        """Return True if the key was seen before, otherwise remember it"""
+        if self._bloom is None:
+            if key in self._exact:
+                return True
+            self._exact.add(key)
+            if len(self._exact) >= self.exact_limit:
+                logger.info(
+                    f"Over {self.exact_limit:,} distinct cities, deduplicating with a Bloom filter"
+                )
+                self._bloom = BloomFilter(self.capacity, self.error_rate)
+                for old in self._exact:
+                    self._bloom.add(old)
+                self._exact = None
+            return False
+        
+        if key in self._bloom:
+            return True
+        self._bloom.add(key)
+        return False
+
+def iter_lines(spec: str) -> Iterator[str]:
+    """Lines from a file, every file matching a glob, or stdin ("-")"""
+    if spec == STDIN:
+        yield from sys.stdin
+        return
+    
+    if any(c in spec for c in "*?["):
+        paths = sorted(glob.glob(spec))
+        if not paths:
+            raise FileNotFoundError(f"No cities files match: {spec}")
+    else:
+        paths = [spec]
+    
+    for path in map(Path, paths):
+        if not path.exists():
+            raise FileNotFoundError(f"Cities file not found: {path}")
+        with path.open(encoding="utf-8") as f:
+            yield from f
+
+def unique_cities(names: Iterable[str], exclude: Iterable[str] = ()) -> Iterator[str]:
+    """Clean city names, skipping blanks, `#` comments and repeats
+    
+    Cities in `exclude` are treated as already seen.
+    """
+    dedupe = Deduplicator()
+    for city in exclude:
+        dedupe.seen(city_key(city))
+    
+    loaded = duplicates = 0
+    for name in names:
+        city = clean_city(name)
+        if not city or city.startswith("#"):
+            continue
+        if dedupe.seen(city.casefold()):
+            duplicates += 1
+            continue
+        loaded += 1
+        yield city
+    
+    logger.info(f"Loaded {loaded} cities ({duplicates} duplicates skipped)")
+
+def iter_cities(sources: Iterable[str], exclude: Iterable[str] = ()) -> Iterator[str]:
+    """Stream cleaned, de-duplicated city names from files, globs and stdin
+    
+    Input is read lazily, so fetching can start before a large file (or a
+    pipe) is exhausted.
+    """
+    lines = (line for spec in sources for line in iter_lines(str(spec)))
+    return unique_cities(lines, exclude)
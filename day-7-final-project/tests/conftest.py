@@ -0,0 +1,151 @@
+"""Shared fixtures: a local stand-in for the OpenWeather API"""
+
+import json
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.config import PipelineConfig
+
+def city_id(name: str) -> int:
+    """The ID the stub gives a city name"""
+    return zlib.crc32(name.lower().encode()) % 1_000_000
+
+def payload(name: str, city_id: int) -> Dict:
+    """A current weather response as OpenWeather sends it"""
+    return {
+        "id": city_id,
+        "name": name,
+        "sys": {"country": "GB"},
+        "main": {"temp": 10.0 + city_id % 7, "humidity": 50},
+        "weather": [{"description": "clear sky"}],
+        "wind": {"speed": 3.5},
+    }
+
+class StubAPI:
+    """OpenWeather API on a local port
+    
+    Every city answers 200 unless told otherwise: script() queues statuses
+    a city gets before it succeeds, `not_found` holds names answered with
+    404, and `group_status`/`group_skip` make group requests fail or leave
+    IDs out. `requests` counts calls per endpoint and `cities` per city.
+    Group responses name cities known() was told about.
+    """
+    
+    def __init__(self):
+        self.requests = Counter()
+        self.cities = Counter()
+        self.not_found = set()
+        self.group_status = 200
+        self.group_skip = set()
+        self.latency = 0.0
+        self.retry_after: Optional[str] = None
+        self._names: Dict[int, str] = {}
+        self._scripts = defaultdict(deque)
+        self._lock = threading.Lock()
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data/2.5"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+    
+    def known(self, city: str) -> int:
+        """The city's ID, which group requests may then ask for"""
+        self._names[city_id(city)] = city
+        return city_id(city)
+    
+    def script(self, city: str, *statuses: int):
+        """Answer the next requests for a city with these statuses"""
+        with self._lock:
+            self._scripts[city.lower()].extend(statuses)
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def respond(self, path: str, query: Dict) -> Tuple[int, Dict, Dict]:
+        time.sleep(self.latency)
+        
+        if path.endswith("/group"):
+            with self._lock:
+                self.requests["group"] += 1
+            if self.group_status != 200:
+                return self.group_status, {"cod": self.group_status}, {}
+            ids = [int(i) for i in query["id"][0].split(",") if int(i) not in self.group_skip]
+            return 200, {"cnt": len(ids), "list": [payload(self._names[i], i) for i in ids]}, {}
+        
+        city = query["q"][0]
+        with self._lock:
+            self.requests["weather"] += 1
+            self.cities[city.lower()] += 1
+            scripted = self._scripts[city.lower()]
+            status = scripted.popleft() if scripted else 200
+        
+        if city.lower() in self.not_found:
+            return 404, {"cod": "404", "message": "city not found"}, {}
+        if status != 200:
+            headers = {"Retry-After": self.retry_after} if self.retry_after is not None else {}
+            return status, {"cod": status}, headers
+        return 200, payload(city, city_id(city)), {}
+    
+    def _handler(self):
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, body, headers = api.respond(url.path, parse_qs(url.query))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+        
+        return Handler
+
+@pytest.fixture
+def api():
+    stub = StubAPI()
+    yield stub
+    stub.close()
+
+@pytest.fixture
+def config(api, tmp_path) -> PipelineConfig:
+    """A fast config pointed at the stub, with every file under tmp_path"""
+    return PipelineConfig(
+        api_key="test-key",
+        api_keys=[],
+        api_base_url=f"{api.url}/weather",
+        api_group_url=f"{api.url}/group",
+        calls_per_second=1000,
+        rate_limit_burst=100,
+        rate_limit_file=None,
+        quota_per_minute=None,
+        quota_per_day=None,
+        quota_per_month=None,
+        base_delay=0.01,
+        max_delay=0.05,
+        cache_enabled=False,
+        use_city_index=False,
+        base_dir=tmp_path,
+    )
+
+@pytest.fixture(params=["sync", "async"])
+def engine(request, config) -> str:
+    """Run a test on both fetch engines"""
+    config.engine = request.param
+    return request.param
@@ -0,0 +1,42 @@
+"""Group batching of cities with known IDs, and its fallback to single requests"""
+
+import pytest
+
+from src.pipeline import WeatherPipeline
+
+CITIES = [f"City{i}" for i in range(12)]
+
+@pytest.fixture
+def pipeline(config, api):
+    """A batching pipeline whose cache knows the ID of every city but the last"""
+    config.cache_enabled = True
+    config.batch_size = 5
+    pipeline = WeatherPipeline(config)
+    for city in CITIES[:-1]:
+        pipeline.client.cache.put_city_id(city, api.known(city))
+    return pipeline
+
+def test_known_cities_are_batched(pipeline, api):
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert [weather.city for weather in results] == CITIES
+    assert api.requests["group"] == 3  # 11 known IDs in groups of 5
+    assert api.cities == {"city11": 1}
+    assert pipeline.stats.group_requests == 3
+    assert pipeline.stats.batched_cities == 11
+
+def test_failed_group_falls_back_to_single_requests(pipeline, api):
+    api.group_status = 400
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert [weather.city for weather in results] == CITIES
+    assert api.requests["weather"] == len(CITIES)
+    assert pipeline.stats.success == len(CITIES)
+
+def test_cities_missing_from_group_are_fetched_singly(pipeline, api):
+    api.group_skip = {api.known("City2"), api.known("City7")}
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert [weather.city for weather in results] == CITIES
+    assert api.requests["group"] == 3
+    assert set(api.cities) == {"city2", "city7", "city11"}
@@ -0,0 +1,56 @@
+"""Single-city fetching: results, 404s, requeues and the run deadline"""
+
+import pytest
+
+from src.pipeline import WeatherPipeline
+
+CITIES = ["London", "Paris", "Berlin"]
+
+def test_fetches_every_city(config, engine, api):
+    pipeline = WeatherPipeline(config)
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert [weather.city for weather in results] == CITIES
+    assert pipeline.stats.success == 3
+    assert api.requests["weather"] == 3
+
+def test_not_found_city_fails(config, engine, api):
+    api.not_found.add("atlantis")
+    pipeline = WeatherPipeline(config)
+    results = pipeline.fetch_weather(["London", "Atlantis"])
+    
+    assert [weather.city for weather in results] == ["London"]
+    assert (pipeline.stats.success, pipeline.stats.failed) == (1, 1)
+    assert api.cities["atlantis"] == 1  # 404 is not retried
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttled_city_is_requeued(config, engine, api, status):
+    api.script("Paris", status, status)
+    pipeline = WeatherPipeline(config)
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert sorted(weather.city for weather in results) == sorted(CITIES)
+    assert pipeline.stats.requeued == 2
+    assert api.cities["paris"] == 3
+
+def test_requeues_are_capped(config, engine, api):
+    api.script("Paris", *[503] * (config.max_requeues + 1))
+    pipeline = WeatherPipeline(config)
+    results = pipeline.fetch_weather(CITIES)
+    
+    assert sorted(weather.city for weather in results) == ["Berlin", "London"]
+    assert pipeline.stats.failed == 1
+    assert api.cities["paris"] == config.max_requeues + 1
+
+def test_deadline_cuts_run_short(config, engine, api):
+    config.calls_per_second = 5
+    config.rate_limit_burst = 1
+    config.deadline = 0.5
+    cities = [f"City{i}" for i in range(20)]
+    pipeline = WeatherPipeline(config)
+    results = pipeline.fetch_weather(cities)
+    
+    assert pipeline.deadline_reached
+    assert 0 < len(results) < len(cities)
+    assert api.requests["weather"] == len(results)
+    assert pipeline.stats.duration_seconds < 2
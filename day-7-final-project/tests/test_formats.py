@@ -0,0 +1,74 @@
+"""Output sinks and merging shard outputs"""
+
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+
+from src import cli
+from src.api import WeatherData
+from src.formats import DataReader, DataWriter, ParquetSink, arrow_schema, cast_record
+from src.pipeline import WeatherPipeline
+
+SCHEMA = arrow_schema(WeatherData, fetched_at=str)
+
+def records(*cities):
+    return [
+        WeatherData(city, "GB", 10.5 + i, 60 + i, "clear sky", 3.0, fetched_at=1_700_000_000.0).to_dict()
+        for i, city in enumerate(cities)
+    ]
+
+@pytest.mark.parametrize("format", ["jsonl", "csv", "parquet"])
+def test_sink_round_trip(tmp_path, format):
+    path = tmp_path / f"out.{format}"
+    data = records("London", "Paris", "Berlin")
+    with DataWriter.open(path, schema=SCHEMA) as sink:
+        sink.write(data[0])
+        sink.write_many(data[1:])
+    
+    assert sink.count == 3
+    assert [cast_record(record, WeatherData, fetched_at=str) for record in DataReader.read(path)] == data
+
+def test_empty_sink_writes_no_file(tmp_path):
+    with DataWriter.open(tmp_path / "out.csv") as sink:
+        pass
+    
+    assert sink.count == 0
+    assert not sink.path.exists()
+
+def test_parquet_sink_writes_row_groups(tmp_path):
+    path = tmp_path / "out.parquet"
+    with ParquetSink(path, schema=SCHEMA, row_group_size=2) as sink:
+        for record in records("London", "Paris", "Berlin", "Madrid", "Rome"):
+            sink.write(record)
+    
+    parquet = pq.ParquetFile(path)
+    assert parquet.schema_arrow == SCHEMA
+    assert parquet.num_row_groups == 3
+
+def test_fetch_streams_to_sink(config, engine, api, tmp_path):
+    path = tmp_path / "weather.jsonl"
+    pipeline = WeatherPipeline(config)
+    with DataWriter.open(path, schema=SCHEMA) as sink:
+        assert pipeline.fetch_weather(["London", "Paris"], sink=sink) == []
+    
+    assert sorted(record["city"] for record in DataReader.read(path)) == ["London", "Paris"]
+
+def test_merge_dedupes_and_types_columns(tmp_path, monkeypatch):
+    DataWriter.write(records("London", "Paris"), tmp_path / "a.jsonl")
+    DataWriter.write(records("Paris", "Berlin"), tmp_path / "b.csv")
+    DataWriter.write_metadata(tmp_path / "a.jsonl", {"stats": {"total": 2, "success": 2}})
+    DataWriter.write_metadata(tmp_path / "b.csv", {"stats": {"total": 3, "success": 2}})
+    output = tmp_path / "merged.parquet"
+    
+    monkeypatch.setattr(sys, "argv", ["cli", "merge", str(tmp_path / "a.jsonl"), str(tmp_path / "b.csv"), "-o", str(output)])
+    assert cli.main() == 0
+    
+    table = pq.read_table(output)
+    assert table.schema == SCHEMA
+    assert table.column("city").to_pylist() == ["London", "Paris", "Berlin"]
+    assert table.column("temp_celsius").to_pylist() == [10.5, 11.5, 11.5]
+    
+    metadata = DataReader.read_metadata(output)
+    assert metadata["record_count"] == 3
+    assert (metadata["stats"]["total"], metadata["stats"]["success"]) == (5, 4)
@@ -0,0 +1,42 @@
+"""Resuming a run from its journal"""
+
+from src.journal import RunJournal
+from src.pipeline import WeatherPipeline
+
+CITIES = ["London", "Paris", "Berlin", "Madrid"]
+
+def test_resume_fetches_only_unfinished_cities(config, engine, api):
+    api.script("Paris", *[503] * (config.max_requeues + 1))
+    journal = RunJournal.create(config.runs_dir)
+    first = WeatherPipeline(config)
+    first.fetch_weather(journal.track(CITIES), journal)
+    journal.close()
+    assert first.stats.failed == 1
+    
+    journal = RunJournal.open(config.runs_dir, journal.run_id)
+    assert journal.inputs() == CITIES
+    assert sorted(journal.completed()) == ["Berlin", "London", "Madrid"]
+    
+    api.cities.clear()
+    second = WeatherPipeline(config)
+    results = second.fetch_weather(journal.inputs(), journal)
+    journal.close()
+    
+    assert [weather.city for weather in results] == CITIES
+    assert api.cities == {"paris": 1}
+    assert (second.stats.resumed, second.stats.success) == (3, 4)
+    assert sorted(RunJournal.open(config.runs_dir, journal.run_id).completed()) == sorted(CITIES)
+
+def test_torn_journal_line_is_ignored(config):
+    journal = RunJournal.create(config.runs_dir, ["cities.txt"])
+    list(journal.track(["London"]))
+    journal.close()
+    with journal.path.open("a", encoding="utf-8") as f:
+        f.write('{"city": "Par')
+    
+    journal = RunJournal.open(config.runs_dir, journal.run_id)
+    list(journal.track(["Paris"]))
+    journal.close()
+    
+    assert journal.inputs() == ["London", "Paris"]
+    assert journal.sources() == ["cities.txt"]